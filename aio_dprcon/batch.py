@@ -0,0 +1,142 @@
+"""
+High-throughput datagram transport
+
+The default asyncio datagram transport calls datagram_received once per packet. BatchDatagramTransport
+drains its non-blocking socket in a loop each time it becomes readable and hands up to ``batch_size``
+packets at once to the protocol's ``datagrams_received(list of (data, addr))``, falling back to
+datagram_received for protocols without it. Outgoing packets are queued and written in one callback per
+event loop iteration.
+"""
+import asyncio
+import collections
+import socket
+
+__all__ = ['BatchDatagramTransport', 'create_batch_datagram_endpoint']
+
+MAX_DATAGRAM_SIZE = 65536
+
+
+class BatchDatagramTransport(asyncio.DatagramTransport):
+    def __init__(self, loop, sock, protocol, batch_size=64):
+        super().__init__()
+        self.loop = loop
+        self.sock = sock
+        self.protocol = protocol
+        self.batch_size = batch_size
+        self.send_queue = collections.deque()
+        self.flush_scheduled = False
+        self.writer_registered = False
+        self.closing = False
+        self.deliver = getattr(protocol, 'datagrams_received', None) or self.deliver_one_by_one
+        self.loop.add_reader(self.sock.fileno(), self.read_ready)
+
+    def deliver_one_by_one(self, datagrams):
+        for data, addr in datagrams:
+            self.protocol.datagram_received(data, addr)
+
+    def read_ready(self):
+        batch = []
+        recvfrom = self.sock.recvfrom
+        for _ in range(self.batch_size):
+            try:
+                batch.append(recvfrom(MAX_DATAGRAM_SIZE))
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as exc:
+                self.protocol.error_received(exc)
+                break
+        if batch:
+            self.deliver(batch)
+
+    def sendto(self, data, addr=None):
+        if self.closing:
+            return
+        self.send_queue.append((data, addr))
+        if not self.flush_scheduled and not self.writer_registered:
+            self.flush_scheduled = True
+            self.loop.call_soon(self.flush)
+
+    def flush(self):
+        self.flush_scheduled = False
+        queue = self.send_queue
+        sock = self.sock
+        while queue:
+            data, addr = queue[0]
+            try:
+                if addr is None:
+                    sock.send(data)
+                else:
+                    sock.sendto(data, addr)
+            except (BlockingIOError, InterruptedError):
+                # The socket buffer is full, continue once it's writable
+                if not self.writer_registered:
+                    self.writer_registered = True
+                    self.loop.add_writer(sock.fileno(), self.write_ready)
+                return
+            except OSError as exc:
+                self.protocol.error_received(exc)
+            queue.popleft()
+
+    def write_ready(self):
+        self.loop.remove_writer(self.sock.fileno())
+        self.writer_registered = False
+        self.flush()
+
+    def get_write_buffer_size(self):
+        return sum(len(data) for data, _ in self.send_queue)
+
+    def get_extra_info(self, name, default=None):
+        if name == 'sockname':
+            return self.sock.getsockname()
+        if name == 'peername':
+            try:
+                return self.sock.getpeername()
+            except OSError:
+                return default
+        if name == 'socket':
+            return self.sock
+        return default
+
+    def is_closing(self):
+        return self.closing
+
+    def close(self):
+        if self.closing:
+            return
+        self.closing = True
+        self.loop.remove_reader(self.sock.fileno())
+        if self.writer_registered:
+            self.loop.remove_writer(self.sock.fileno())
+        self.send_queue.clear()
+        self.sock.close()
+        self.loop.call_soon(self.protocol.connection_lost, None)
+
+    def abort(self):
+        self.close()
+
+
+async def create_batch_datagram_endpoint(loop, protocol_factory, local_addr=None, remote_addr=None, batch_size=64):
+    """
+    Counterpart of loop.create_datagram_endpoint returning a BatchDatagramTransport
+    """
+    family = socket.AF_INET
+    if remote_addr is not None:
+        infos = await loop.getaddrinfo(*remote_addr, type=socket.SOCK_DGRAM)
+        family, _, _, _, remote_addr = infos[0]
+    elif local_addr is not None:
+        infos = await loop.getaddrinfo(*local_addr, type=socket.SOCK_DGRAM)
+        family, _, _, _, local_addr = infos[0]
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        sock.setblocking(False)
+        if local_addr is not None:
+            sock.bind(local_addr)
+        if remote_addr is not None:
+            sock.connect(remote_addr)
+    except OSError:
+        sock.close()
+        raise
+    protocol = protocol_factory()
+    transport = BatchDatagramTransport(loop, sock, protocol, batch_size=batch_size)
+    protocol.connection_made(transport)
+    return transport, protocol
@@ -1,10 +1,11 @@
-import asyncio
 import sys
 
 import click
 
 from .config import Config, ServerConfigItem
-from .shell import RconShell
+
+# Only the modules needed by every command are imported at the top: the client, the shell and their
+# dependencies are imported by the commands that use them, see tests/test_startup.py
 
 
 @click.group()
@@ -60,27 +61,165 @@ def connect(server_name):
     """
     Connect to a server SERVER_NAME
     """
+    from .shell import RconShell
     config = Config.load()
     server = config.get_server(server_name)
     completions = server.load_completions()
     rcon_client = server.get_client()
-    if completions:
-        rcon_client.completions = completions
+    if completions is not None:
+        rcon_client.completion_cache = completions
     shell = RconShell(server, rcon_client)
-    shell.cmdloop()
+    try:
+        shell.cmdloop()
+    finally:
+        rcon_client.close()
 
 
 @cli.command()
+@click.option('-f', '--force', is_flag=True, help='Refresh even if the server build has not changed')
 @click.argument('server_name')
-def refresh(server_name):
+def refresh(server_name, force):
     """
     Refresh completions cache for SERVER_NAME
     """
+    import asyncio
+    from .completion import CompletionCache
     config = Config.load()
     server = config.get_server(server_name)
     loop = asyncio.get_event_loop()
     rcon_client = server.get_client(loop)
-    loop.run_until_complete(rcon_client.connect_once())
-    loop.run_until_complete(rcon_client.load_completions())
-    server.update_completions(rcon_client.completions)
+    try:
+        if not loop.run_until_complete(rcon_client.connect_once()):
+            click.secho('Could not connect to server.', fg='red')
+            sys.exit(1)
+        meta = {'version': rcon_client.status.get('version'), 'protocol': rcon_client.status.get('protocol')}
+        cached = server.load_completions()
+        cached_meta = getattr(cached, 'meta', None)
+        if isinstance(cached, CompletionCache):
+            cached.close()
+        if not force and cached_meta == meta:
+            click.secho('Completions are up to date for {}'.format(meta['version']), fg='green', bold=True)
+            return
+        loop.run_until_complete(rcon_client.load_completions())
+        server.update_completions(rcon_client.completions, meta)
+    finally:
+        rcon_client.close()
+
+
+@cli.command('exec')
+@click.option('--all', 'all_servers', is_flag=True, help='Run the command on every configured server')
+@click.option('-s', '--server', 'server_names', multiple=True, help='Run the command on this server (repeatable)')
+@click.option('-c', '--concurrency', default=32, show_default=True, help='Maximum number of servers at once')
+@click.option('-t', '--timeout', default=5.0, show_default=True, help='Seconds to wait for each server')
+@click.argument('command', nargs=-1, required=True)
+def exec_(all_servers, server_names, concurrency, timeout, command):
+    """
+    Execute COMMAND on several servers at once
+    """
+    import asyncio
+    import dpcolors
+    from .exceptions import RconCommandFailed
+    from .pool import RconPool
+    config = Config.load()
+    if all_servers:
+        servers = list(config.servers.values())
+    else:
+        servers = [config.get_server(name) for name in server_names]
+    if not servers:
+        raise click.UsageError('No servers given, use --server SERVER_NAME or --all')
+    loop = asyncio.get_event_loop()
+    pool = RconPool(loop)
+    for server in servers:
+        server.add_to_pool(pool)
+
+    async def __run():
+        failed = 0
+        for result in pool.broadcast(' '.join(command), concurrency=concurrency, timeout=timeout):
+            result = await result
+            click.secho('{}:'.format(result.name), fg='red' if result.error else 'green', bold=True)
+            if result.response:
+                cs = dpcolors.ColorString.from_dp(result.response)
+                click.echo(cs.to_ansi_8bit().decode('utf8'), nl=False)
+            if result.error:
+                failed += 1
+                message = result.error.args[0] if isinstance(result.error, RconCommandFailed) else result.error
+                click.secho('  {}'.format(message), fg='red')
+        return failed
+
+    try:
+        failed = loop.run_until_complete(__run())
+    finally:
+        pool.close()
+    if failed:
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--ip', 'listen_ip', required=True, help='IP address the servers should send their logs to')
+@click.option('-p', '--port', default=None, type=int, help='UDP port to receive the logs on')
+@click.option('--socket', 'socket_path', default=None, help='Unix socket to serve the logs on')
+@click.option('-s', '--server', 'server_names', multiple=True, help='Collect the log of this server '
+                                                                    '(repeatable, every server by default)')
+@click.option('--metrics-port', type=int, default=None, help='Serve Prometheus metrics on this local TCP port')
+def listen(listen_ip, port, socket_path, server_names, metrics_port):
+    """
+    Collect the logs of the servers and serve them over a Unix socket
+    """
+    import asyncio
+    from .listener import LogListener, DEFAULT_LOG_PORT, DEFAULT_SOCKET_PATH
+    config = Config.load()
+    if server_names:
+        servers = [config.get_server(name) for name in server_names]
+    else:
+        servers = list(config.servers.values())
+    loop = asyncio.get_event_loop()
+    listener = LogListener(loop, listen_ip, port or DEFAULT_LOG_PORT, socket_path or DEFAULT_SOCKET_PATH,
+                           metrics_port=metrics_port)
+    for server in servers:
+        listener.add_server(server.name, server.host, server.port, password=server.password, secure=server.secure)
+    click.secho('Serving the logs of {} servers on {}'.format(len(servers), listener.socket_path), fg='green',
+                bold=True)
+    try:
+        loop.run_until_complete(listener.run_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option('-s', '--server', 'server_names', multiple=True, help='Probe this server (repeatable, every server '
+                                                                    'by default)')
+@click.option('-t', '--timeout', default=1.0, show_default=True, help='Seconds to wait for each answer')
+@click.option('-r', '--retries', default=1, show_default=True, help='Number of resends to unanswered servers')
+def probe(server_names, timeout, retries):
+    """
+    Query the servers status without rcon (getstatus)
+    """
+    import asyncio
+    import dpcolors
+    from .probe import Prober
+    config = Config.load()
+    if server_names:
+        servers = [config.get_server(name) for name in server_names]
+    else:
+        servers = list(config.servers.values())
+    loop = asyncio.get_event_loop()
+    prober = Prober(loop, timeout=timeout, retries=retries)
+
+    async def __run():
+        failed = 0
+        for result in prober.sweep([(server.name, server.host, server.port) for server in servers]):
+            result = await result
+            if result.error is not None:
+                failed += 1
+                click.secho('{}: no answer ({})'.format(result.name, result.error or 'timeout'), fg='red', bold=True)
+                continue
+            hostname = dpcolors.ColorString.from_dp(result.info.get('hostname', '')).to_ansi_8bit().decode('utf8')
+            click.echo('{} {:>4.0f}ms {}/{} {} {}'.format(
+                click.style(result.name + ':', fg='green', bold=True), result.rtt * 1000, len(result.players),
+                result.info.get('sv_maxclients', '?'), result.info.get('mapname', '?'), hostname))
+        return failed
 
+    failed = loop.run_until_complete(__run())
+    prober.close()
+    if failed:
+        sys.exit(1)
@@ -1,4 +1,9 @@
 import asyncio
+import collections
+import ipaddress
+import logging
+import re
+import socket
 import string
 import sys
 import time
@@ -6,36 +11,139 @@ from contextlib import contextmanager
 
 import click
 
-from .exceptions import RconCommandFailed
-from .parser import CombinedParser, StatusItemParser, CvarParser, AproposCvarParser, AproposAliasCommandParser, \
-    CvarListParser, AliasListParser, CmdListParser
-from .protocol import create_rcon_protocol, RCON_NOSECURE
+from .completion import CompletionIndex, MergedCompletions
+from .events import EventStream, ALL_EVENTS
+from .exceptions import RconCommandFailed, RconCommandTimeout, RconCommandRetryNumberExceeded
+from .metrics import ClientMetrics
+from .parser import CombinedParser, StatusItemParser, StatusTableHeaderParser, StatusPlayerParser, CvarParser, \
+    AproposCvarParser, AproposAliasCommandParser, CvarListParser, AliasListParser, CmdListParser, EventLogParser, \
+    ResultsParser
+from .protocol import create_rcon_protocol, RconSigner, RCON_NOSECURE
+from .ratelimit import SendQueue, HIGH, NORMAL, BULK, DEFAULT_RATE, DEFAULT_BURST
+from .sinks import StreamSink
+from .status import ServerStatus
+
+logger = logging.getLogger(__name__)
 
 __all__ = ['RconClient']
 
+# execute() follows every command with an ``echo`` of this marker, the marker line terminates the response
+RESPONSE_MARKER = 'aio_dprcon_eoc_{}'
+RESPONSE_MARKER_PREFIX = RESPONSE_MARKER.format('').encode('utf8')
+RESPONSE_MARKER_REGEX = re.compile(re.escape(RESPONSE_MARKER_PREFIX) + rb'(\d+)[^\n]*\n')
+
+CVAR_PREFIXES = string.ascii_lowercase + '_'
+# A prefix whose cvarlist comes back incomplete is split by appending each of these
+CVAR_PREFIX_CHARS = string.ascii_lowercase + string.digits + '_'
+MAX_CVAR_PREFIX_LENGTH = 6
+
+# Seconds to trust the addresses remote_host resolved to, connect_forever resolves it again in the background
+RESOLVE_TTL = 300
+
+
+def literal_addrs(host, port):
+    """
+    The address of ``host`` if it's an IP address literal, which needs no resolving, otherwise an empty set
+    """
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return frozenset()
+    return frozenset([(str(ip), port)])
+
+
+def retry_delays(timeout, retries, backoff):
+    """
+    Intervals between attempts growing by ``backoff`` times and adding up to ``timeout``
+    """
+    if backoff == 1:
+        first = timeout / retries
+    else:
+        first = timeout * (backoff - 1) / (backoff ** retries - 1)
+    return [first * backoff ** i for i in range(retries)]
+
+
+class ListingCollector:
+    """
+    Stands in for RconClient when parsing a single listing response
+    """
+    def __init__(self):
+        self.completions = {'cvar': {}, 'alias': {}, 'command': {}}
+        self.completions_dirty = False
+        self.results = None
+
 
 class RconClient:
     def __init__(self, loop, remote_host, remote_port, password=None, secure=RCON_NOSECURE,
-                 poll_status_interval=6, log_listener_ip=None):
+                 poll_status_interval=6, log_listener_ip=None, pool=None, log_sink=None, batch=False,
+                 rate=DEFAULT_RATE, burst=DEFAULT_BURST):
         self.loop = loop
+        self.pool = pool
+        # Receive on a BatchDatagramTransport, which hands the log to the parser a batch of datagrams at a time
+        self.batch = batch
         self.remote_host = remote_host
         self.remote_port = remote_port
+        # Addresses (ip, port) datagrams of the server may come from, remote_addr is the one commands are sent to
+        self.remote_addrs = literal_addrs(remote_host, remote_port)
+        self.remote_addr = next(iter(self.remote_addrs), None)
+        self.resolved_at = None if self.remote_addrs else 0
+        self.resolve_task = None
         self.secure = secure
         self.password = password
+        self.signer = RconSigner(password) if secure != RCON_NOSECURE else None
         self.poll_status_interval = poll_status_interval
         self.log_listener_ip = log_listener_ip
         self.cmd_transport = self.cmd_protocol = self.log_transport = self.log_protocol = None
-        self.status = {}
+        self.status = ServerStatus()
         self.cvars = {}
         self.cmd_timestamp = 0
         self.log_timestamp = 0
         self.admin_nick = ''
-        self.log_parser = CombinedParser(self, dump_to=sys.stdout.buffer)
+        self.event_streams = []
+        self.event_kinds = frozenset()
+        if log_sink is None:
+            log_sink = StreamSink(loop, sys.stdout.buffer)
+        # Pass log_sink=False to not dump the raw log anywhere
+        self.log_sink = log_sink or None
+        self.log_parser = CombinedParser(self, parsers=[EventLogParser], dump_to=self.log_sink)
         self.cmd_parser = CombinedParser(
-            self, parsers=[StatusItemParser, CvarParser, AproposCvarParser, AproposAliasCommandParser,
-                           CvarListParser])
+            self, parsers=[StatusItemParser, StatusTableHeaderParser, StatusPlayerParser, CvarParser,
+                           AproposCvarParser, AproposAliasCommandParser, CvarListParser])
         self.connected = False
         self.completions = {'cvar': {}, 'alias': {}, 'command': {}}
+        # Parsers set completions_dirty when they add to completions, the index is rebuilt on its next use
+        self.completions_dirty = False
+        self.current_completion_index = CompletionIndex(self.completions)
+        # Completions of an earlier session (see Config.load_completions), completed from along with completions
+        self.completion_cache = None
+        self.response_buffer = bytearray()
+        self.response_seq = 0
+        self.pending_responses = {}
+        self.key_waiters = collections.defaultdict(list)
+        # Outgoing packets are limited to ``rate`` per second with bursts of ``burst``, rate=None sends right away
+        self.send_queue = SendQueue(loop, self.send_now, rate, burst) if rate else None
+        if self.send_queue is not None:
+            # Resumed once the command channel is open, see open_cmd_channel
+            self.send_queue.pause()
+        # (sequence number, future) of the pending execute(coalesce=True) calls by command, kept until their last
+        # caller is done: the future may be resolved and gone from pending_responses by then
+        self.shared_responses = {}
+        # Number of execute calls waiting for each pending response
+        self.response_waiters = collections.Counter()
+        self.coalesced = 0
+        self.metrics = ClientMetrics()
+        self.metrics.callback('lines_parsed_total', lambda: self.cmd_parser.lines + self.log_parser.lines,
+                              'Lines fed to the parsers', kind='counter')
+        self.metrics.callback('parse_errors_total', lambda: self.cmd_parser.errors + self.log_parser.errors,
+                              'Lines the parsers failed to process', kind='counter')
+        self.metrics.callback('pending_responses', lambda: len(self.pending_responses), 'Commands awaiting a response')
+        self.metrics.callback('send_queue_length', lambda: len(self.send_queue or ()), 'Packets waiting to be sent')
+        self.metrics.callback('coalesced_total',
+                              lambda: self.coalesced + (self.send_queue.coalesced if self.send_queue else 0),
+                              'Commands not sent because an identical one was pending', kind='counter')
+        self.metrics.callback('connected', lambda: int(self.connected), 'Whether the server answers status')
+        # A metrics.Tracer, called around send, receive and parse
+        self.tracer = None
 
     def check_connection(self, timeout=60):
         if self.log_listener_ip:
@@ -51,31 +159,127 @@ class RconClient:
 
     async def connect_forever(self, connect_log=False):
         while True:
-            if not self.check_connection():
-                if self.connected:
-                    self.connected = False
-                    self.on_server_disconnected()
-                self.connected = await self.connect_once(connect_log)
-            else:
-                await self.update_server_status()
+            await self.poll(connect_log)
             await asyncio.sleep(self.poll_status_interval)
 
+    async def poll(self, connect_log=False):
+        self.refresh_addrs()
+        if not self.check_connection():
+            if self.connected:
+                self.connected = False
+                self.on_server_disconnected()
+            self.connected = await self.connect_once(connect_log)
+        else:
+            await self.update_server_status()
+
     async def connect_once(self, connect_log=False):
-        self.cmd_transport, self.cmd_protocol = await self._connect(self.cmd_data_received)
+        # A reconnect replaces the channels, the old ones must not keep their sockets and challenge timers
+        self.close_channel()
+        await self.open_cmd_channel()
         status = await self.update_server_status()
         if status:
             self.connected = True
             self.on_server_connected()
         if connect_log and status:
-            self.log_transport, self.log_protocol = await self._connect(self.log_data_received)
+            self.close_channel(log=True)
+            self.log_transport, self.log_protocol = await self._connect(self.log_data_received, log=True,
+                                                                        batch_callback=self.log_batch_received)
             self.subscribe_to_log()
             await self.cleanup_log_dest_udp()
         return status
 
-    async def _connect(self, callback):
-        protocol_class = create_rcon_protocol(self.password, self.secure, callback)
-        return await self.loop.create_datagram_endpoint(protocol_class,
-                                                        remote_addr=(self.remote_host, self.remote_port))
+    async def open(self):
+        """
+        Opens the command channel, if it isn't open yet, without checking that the server responds
+        """
+        if self.cmd_protocol is None:
+            await self.open_cmd_channel()
+
+    async def open_cmd_channel(self):
+        self.cmd_transport, self.cmd_protocol = await self._connect(self.cmd_data_received)
+        if self.send_queue is not None:
+            self.send_queue.resume()
+
+    def close_channel(self, log=False):
+        """
+        Closes the command (or log) channel, a pooled client only lets go of its share of the pool socket
+        """
+        if log:
+            transport, protocol = self.log_transport, self.log_protocol
+            self.log_transport = self.log_protocol = None
+        else:
+            transport, protocol = self.cmd_transport, self.cmd_protocol
+            self.cmd_transport = self.cmd_protocol = None
+            if self.send_queue is not None:
+                # Commands sent meanwhile wait for the next channel
+                self.send_queue.pause()
+        if protocol is None:
+            return
+        if self.pool is not None:
+            self.pool.release(protocol, log=log)
+        elif transport is not None:
+            # connection_lost, which cancels the challenge timer, follows
+            transport.close()
+        else:
+            protocol.connection_lost(None)
+
+    def close(self):
+        """
+        Closes both channels and the log sink, writing out the log it still buffers
+        """
+        if self.send_queue is not None:
+            self.send_queue.clear()
+        self.close_channel(log=True)
+        self.close_channel()
+        if self.log_sink is not None:
+            self.log_sink.close()
+
+    async def resolve(self):
+        """
+        Resolves remote_host, returns the set of addresses the server's datagrams are accepted from
+        """
+        # A pool socket can only reach addresses of its own family
+        family = self.pool.family if self.pool is not None else socket.AF_UNSPEC
+        infos = await self.loop.getaddrinfo(self.remote_host, self.remote_port, family=family, type=socket.SOCK_DGRAM)
+        addrs = [info[4][:2] for info in infos]
+        changed = self.remote_addr not in addrs
+        self.remote_addrs = frozenset(addrs)
+        self.resolved_at = time.monotonic()
+        if changed:
+            self.remote_addr = addrs[0]
+            if self.pool is not None:
+                self.pool.reroute(self)
+        return self.remote_addrs
+
+    def refresh_addrs(self):
+        """
+        Starts resolving remote_host again in the background once the addresses are older than RESOLVE_TTL
+        """
+        if self.resolved_at is None or time.monotonic() - self.resolved_at < RESOLVE_TTL:
+            return
+        if self.resolve_task is not None and not self.resolve_task.done():
+            return
+
+        async def __resolve():
+            try:
+                await self.resolve()
+            except OSError as e:
+                # Keep using the old addresses, try again on the next poll
+                logger.warning('Could not resolve %s: %s', self.remote_host, e)
+
+        self.resolve_task = self.loop.create_task(__resolve())
+
+    async def _connect(self, callback, log=False, batch_callback=None):
+        if not self.remote_addrs:
+            await self.resolve()
+        if self.pool is not None:
+            return await self.pool.attach(self, callback, log=log, batch_callback=batch_callback)
+        protocol_class = create_rcon_protocol(self.password, self.secure, callback, signer=self.signer,
+                                              batch_callback=batch_callback)
+        if self.batch:
+            from .batch import create_batch_datagram_endpoint
+            return await create_batch_datagram_endpoint(self.loop, protocol_class, remote_addr=self.remote_addr)
+        return await self.loop.create_datagram_endpoint(protocol_class, remote_addr=self.remote_addr)
 
     def subscribe_to_log(self):
         self.send("sv_cmd addtolist log_dest_udp %s:%s" % (self.log_listener_ip, self.log_protocol.local_port))
@@ -85,9 +289,8 @@ class RconClient:
         self.send("sv_eventlog_console 1")
 
     async def cleanup_log_dest_udp(self):
-        self.cvars['log_dest_udp'] = None
         try:
-            await self.execute_with_retry('log_dest_udp', lambda: self.cvars['log_dest_udp'] is not None)
+            await self.execute_with_retry('log_dest_udp', 'log_dest_udp')
         except RconCommandFailed:
             return
         for i in self.cvars['log_dest_udp'].split(' '):
@@ -97,13 +300,25 @@ class RconClient:
 
     async def update_server_status(self):
         try:
-            self.status = {}
-            await self.execute_with_retry('status 1', lambda: 'players' in self.status)
+            # The status is updated in place once the answer is complete, see status_received
+            await self.execute_with_retry('status 1', 'table', namespace='status', priority=HIGH, coalesce=True)
         except RconCommandFailed:
+            self.status.reset()
             return False
         else:
             return True
 
+    def status_received(self):
+        for change in self.status.commit():
+            self.on_status_change(change)
+        self.key_received('status', 'table')
+
+    def on_status_change(self, change):
+        """
+        Called with every change (player joined/left, map or frags changed) between two status updates
+        """
+        self.event_received(change)
+
     @contextmanager
     def sv_adminnick(self, new_nick):
         old_nick = self.cvars.get('sv_adminnick') or ''
@@ -111,85 +326,317 @@ class RconClient:
         yield
         self.send('sv_adminnick "%s"' % old_nick)
 
-    def send(self, command):
+    def send(self, *commands, priority=NORMAL, coalesce=False):
+        """
+        Queues commands to be sent back to back, see ratelimit.SendQueue. With ``coalesce`` they are dropped if
+        identical commands are still waiting in the queue.
+        """
+        if self.send_queue is None:
+            for command in commands:
+                self.send_now(command)
+        else:
+            self.send_queue.put(commands, priority=priority, coalesce=coalesce)
+
+    def send_now(self, command):
+        self.metrics.commands_sent.inc()
+        if self.tracer is not None:
+            self.tracer.send(self, command)
         self.cmd_protocol.send(command)
 
     def verify_data(self, data, addr):
-        # TODO: resolve self.remote host to IP
-        if addr[0] != self.remote_host or addr[1] != self.remote_port:
-            return False
-        else:
-            return True
+        return addr[:2] in self.remote_addrs
+
+    def wait_for_key(self, namespace, key):
+        future = self.loop.create_future()
+        self.key_waiters[(namespace, key)].append(future)
+        return future
+
+    def discard_waiter(self, namespace, key, future):
+        waiters = self.key_waiters.get((namespace, key))
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self.key_waiters[(namespace, key)]
+
+    def key_received(self, namespace, key):
+        """
+        Called by parsers whenever they store ``key`` in ``namespace`` (``status``, ``cvars``)
+        """
+        waiters = self.key_waiters.pop((namespace, key), None)
+        if waiters:
+            for future in waiters:
+                if not future.done():
+                    future.set_result(None)
 
     def custom_cmd_callback(self, data, addr):
         pass
 
     def cmd_data_received(self, data, addr):
+        metrics = self.metrics
+        metrics.cmd_packets_received.inc()
+        if self.tracer is not None:
+            self.tracer.receive(self, 'cmd', data, addr)
         if not self.verify_data(data, addr):
+            metrics.packets_dropped.inc()
             return
+        metrics.bytes_received.inc(len(data))
         self.cmd_timestamp = time.time()
         self.custom_cmd_callback(data, addr)
+        if self.pending_responses:
+            self.collect_response(data)
+        started = time.perf_counter()
         self.cmd_parser.feed(data)
+        elapsed = time.perf_counter() - started
+        metrics.parse_seconds.observe(elapsed)
+        if self.tracer is not None:
+            self.tracer.parse(self, 'cmd', data, elapsed)
+
+    def collect_response(self, data):
+        buf = self.response_buffer
+        scan_from = buf.rfind(b'\n') + 1
+        buf += data
+        while True:
+            m = RESPONSE_MARKER_REGEX.search(buf, scan_from)
+            if m is None:
+                return
+            seq = int(m.group(1))
+            line_start = buf.rfind(b'\n', 0, m.start()) + 1
+            response = bytes(buf[:line_start])
+            del buf[:m.end()]
+            scan_from = 0
+            future = self.pending_responses.pop(seq, None)
+            if future is not None and not future.done():
+                future.set_result(response)
+            if not self.pending_responses:
+                buf.clear()
+                return
 
     def custom_log_callback(self, data, addr):
         pass
 
     def log_data_received(self, data, addr):
+        metrics = self.metrics
+        metrics.log_packets_received.inc()
+        if self.tracer is not None:
+            self.tracer.receive(self, 'log', data, addr)
         if not self.verify_data(data, addr):
+            metrics.packets_dropped.inc()
             return
+        metrics.bytes_received.inc(len(data))
         self.log_timestamp = time.time()
         self.custom_log_callback(data, addr)
+        started = time.perf_counter()
         self.log_parser.feed(data)
+        elapsed = time.perf_counter() - started
+        metrics.parse_seconds.observe(elapsed)
+        if self.tracer is not None:
+            self.tracer.parse(self, 'log', data, elapsed)
+
+    def log_batch_received(self, datagrams):
+        metrics = self.metrics
+        tracer = self.tracer
+        chunks = []
+        for data, addr in datagrams:
+            if tracer is not None:
+                tracer.receive(self, 'log', data, addr)
+            if self.verify_data(data, addr):
+                self.custom_log_callback(data, addr)
+                chunks.append(data)
+                metrics.bytes_received.inc(len(data))
+            else:
+                metrics.packets_dropped.inc()
+        metrics.log_packets_received.inc(len(datagrams))
+        if chunks:
+            self.log_timestamp = time.time()
+            started = time.perf_counter()
+            self.log_parser.feed_many(chunks)
+            elapsed = time.perf_counter() - started
+            metrics.parse_seconds.observe(elapsed)
+            if tracer is not None:
+                tracer.parse(self, 'log', b''.join(chunks), elapsed)
+
+    def events(self, *kinds, maxsize=1000):
+        """
+        Returns an EventStream of eventlog events of the given kinds (``join``, ``kill``...), or of all events.
+
+            with client.events('join', 'part') as events:
+                async for event in events:
+                    ...
+        """
+        stream = EventStream(self, kinds, maxsize=maxsize)
+        self.event_streams.append(stream)
+        self.update_event_kinds()
+        return stream
+
+    def remove_event_stream(self, stream):
+        if stream in self.event_streams:
+            self.event_streams.remove(stream)
+            self.update_event_kinds()
+
+    def update_event_kinds(self):
+        kinds = set()
+        for stream in self.event_streams:
+            if stream.kinds is None:
+                self.event_kinds = ALL_EVENTS
+                return
+            kinds.update(i.encode('utf8') for i in stream.kinds)
+        self.event_kinds = frozenset(kinds)
+
+    def event_received(self, event):
+        for stream in self.event_streams:
+            stream.put(event)
 
-    async def load_completions(self):
-        def __print_stage(cur, tot=7):
-            click.secho('Retrieving completions ({}/{})'.format(cur, tot), fg='green', bold=True)
-        cycles = 1
-        additional_prefixes = ['g_', 'hud_', 'notification_', 'sv_']
-        __print_stage(1)
-        with click.progressbar(string.ascii_lowercase + '_') as seq:
-            for p1 in seq:
-                for _ in range(cycles):
-                    self.send('cvarlist {}'.format(p1))
-                    await asyncio.sleep(1)
-        for i, p1 in enumerate(additional_prefixes):
-            __print_stage(2 + i)
-            with click.progressbar(string.ascii_lowercase) as seq:
-                for p2 in seq:
-                    for _ in range(cycles):
-                        self.send('cvarlist {}{}'.format(p1, p2))
-                        await asyncio.sleep(1)
-        prev_parser = self.cmd_parser
-        __print_stage(5)
-        self.cmd_parser = CombinedParser(self, [AliasListParser])
-        for _ in range(cycles):
-            self.send('alias')
-            await asyncio.sleep(3)
-        __print_stage(6)
-        self.cmd_parser = CombinedParser(self, [CmdListParser])
-        for _ in range(cycles):
-            self.send('cmdlist')
-            await asyncio.sleep(3)
-        self.cmd_parser = prev_parser
+    def set_completions(self, completions):
+        self.completions = completions
+        self.completions_dirty = True
+
+    @property
+    def completion_index(self):
+        """
+        CompletionIndex of completions, including the names the parsers have learned since it was last used,
+        merged with completion_cache if there is one
+        """
+        if self.completions_dirty:
+            self.completions_dirty = False
+            self.current_completion_index = CompletionIndex(self.completions)
+        if self.completion_cache is None:
+            return self.current_completion_index
+        return MergedCompletions(self.current_completion_index, self.completion_cache)
+
+    @staticmethod
+    def parse_listing(response, parsers):
+        collector = ListingCollector()
+        CombinedParser(collector, parsers).feed(response)
+        return collector
+
+    async def load_completions(self, concurrency=8, timeout=3, retries=2):
+        """
+        Retrieves cvars, aliases and commands of the server into self.completions.
+
+        All listings are requested at once, at most ``concurrency`` of them in flight. A ``cvarlist PREFIX``
+        response is complete when the number of cvars it lists matches its trailing "N cvars" line, otherwise
+        the prefix is split into longer prefixes which are requested again.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        failed = []
+
+        async def __list(command, parsers, type_):
+            async with semaphore:
+                for _ in range(retries):
+                    try:
+                        response = await self.execute(command, timeout=timeout, priority=BULK)
+                        break
+                    except RconCommandTimeout as e:
+                        response = e.args[1]
+            collector = self.parse_listing(response, parsers)
+            self.completions[type_].update(collector.completions[type_])
+            self.completions_dirty = True
+            if not response:
+                failed.append(command)
+            bar.update(1)
+            return response, collector
+
+        async def __cvarlist(prefix):
+            response, collector = await __list('cvarlist ' + prefix, [ResultsParser, CvarListParser], 'cvar')
+            if response and (collector.results is None or collector.results > len(collector.completions['cvar'])):
+                if len(prefix) >= MAX_CVAR_PREFIX_LENGTH:
+                    failed.append('cvarlist ' + prefix)
+                    return
+                prefixes = [prefix + i for i in CVAR_PREFIX_CHARS]
+                bar.length += len(prefixes)
+                await asyncio.gather(*[__cvarlist(i) for i in prefixes])
+
+        click.secho('Retrieving completions', fg='green', bold=True)
+        with click.progressbar(length=len(CVAR_PREFIXES) + 2) as bar:
+            await asyncio.gather(__list('alias', [AliasListParser], 'alias'),
+                                 __list('cmdlist', [ResultsParser, CmdListParser], 'command'),
+                                 *[__cvarlist(i) for i in CVAR_PREFIXES])
+        if failed:
+            click.secho('No complete response for: {}'.format(', '.join(failed)), fg='yellow')
         counts = (len(self.completions['cvar']),
                   len(self.completions['alias']),
                   len(self.completions['command']))
         print('Loaded completion for %s cvars, %s aliases and %s commands' % counts)
         print('Total: %s completions' % sum(counts))
 
-    async def execute(self, command, timeout=1):
-        self.send(command)
-        await asyncio.sleep(timeout)
-
-    async def execute_with_retry(self, command, condition, retries=3, timeout=3, sleep=0.1):
-        self.send(command)
-        t = time.time()
-        interval = timeout / retries
-        while not condition() and retries > 0:
-            await asyncio.sleep(sleep)
-            if time.time() - t > interval:
-                self.send(command)
-                retries -= 1
-                t = time.time()
-        if not condition():
-            raise RconCommandFailed('Retry number exceeded')
+    async def execute(self, command, timeout=1, priority=NORMAL, coalesce=False):
+        """
+        Sends command and returns its output as soon as the server has answered.
+
+        The command is followed by an ``echo`` of an unique marker, everything received before the marker
+        is the response. Several commands may be in flight at once. Raises RconCommandTimeout if the marker
+        doesn't come back in ``timeout`` seconds, the output received so far is passed as the second argument.
+
+        With ``coalesce`` a command identical to one still awaiting its response isn't sent again, the caller
+        gets the response of the pending one.
+        """
+        seq, future = self.shared_responses.get(command, (None, None)) if coalesce else (None, None)
+        shared = seq is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.response_seq += 1
+            seq = self.response_seq
+            future = self.loop.create_future()
+            self.pending_responses[seq] = future
+            if coalesce:
+                self.shared_responses[command] = seq, future
+        started = time.perf_counter()
+        try:
+            # A shared response stays pending until the last of its callers is done, whoever sent it
+            self.response_waiters[seq] += 1
+            if not shared:
+                self.send(command, 'echo ' + RESPONSE_MARKER.format(seq), priority=priority)
+            # Shielded, so that callers sharing the future aren't cancelled when this one times out
+            response = await asyncio.wait_for(asyncio.shield(future) if coalesce else future, timeout)
+            if not shared:
+                self.metrics.command_rtt.observe(time.perf_counter() - started)
+            return response
+        except asyncio.TimeoutError:
+            self.metrics.command_timeouts.inc()
+            partial = b''
+            if not shared and seq == min(self.pending_responses, default=seq):
+                partial = bytes(self.response_buffer)
+                if self.response_waiters[seq] == 1:
+                    self.response_buffer.clear()
+            raise RconCommandTimeout('Command {!r} timed out'.format(command), partial)
+        finally:
+            self.response_waiters[seq] -= 1
+            if not self.response_waiters[seq]:
+                del self.response_waiters[seq]
+                self.pending_responses.pop(seq, None)
+                if coalesce and self.shared_responses.get(command, (None,))[0] == seq:
+                    del self.shared_responses[command]
+
+    async def execute_with_retry(self, command, key, namespace='cvars', retries=3, timeout=3, backoff=2,
+                                 priority=NORMAL, coalesce=False):
+        """
+        Sends command until a parser reports ``key`` in ``namespace``, up to ``retries`` times within ``timeout``
+        seconds, the interval between resends growing by ``backoff`` times.
+        """
+        future = self.wait_for_key(namespace, key)
+        delays = retry_delays(timeout, retries, backoff)[:-1]
+        timer = None
+
+        def attempt():
+            nonlocal timer
+            self.send(command, priority=priority, coalesce=coalesce)
+            if delays:
+                timer = self.loop.call_later(delays.pop(0), retry)
+
+        def retry():
+            self.metrics.retries.inc()
+            attempt()
+
+        started = time.perf_counter()
+        attempt()
+        try:
+            await asyncio.wait_for(future, timeout)
+            self.metrics.command_rtt.observe(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            self.metrics.retries_exceeded.inc()
+            raise RconCommandRetryNumberExceeded('Retry number exceeded')
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self.discard_waiter(namespace, key, future)
@@ -0,0 +1,184 @@
+import heapq
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+
+__all__ = ['CompletionIndex', 'CompletionCache', 'MergedCompletions']
+
+COMPLETION_TYPES = ('cvar', 'alias', 'command')
+
+
+class CompletionIndex:
+    """
+    Prefix index over the completions dict of RconClient, built once when the completions are loaded.
+
+    Names of all types are kept in one sorted list, a prefix query is a binary search followed by a scan of
+    the matching names. Cvar values are kept for completing the argument of a cvar.
+    """
+    def __init__(self, completions):
+        names = []
+        for name in heapq.merge(*[sorted(completions.get(i) or {}) for i in COMPLETION_TYPES]):
+            if not names or names[-1] != name:
+                names.append(name)
+        self.names = names
+        self.values = dict((k, v) for k, v in (completions.get('cvar') or {}).items() if v is not None)
+
+    def __len__(self):
+        return len(self.names)
+
+    def complete(self, prefix):
+        names = self.names
+        i = bisect_left(names, prefix)
+        matches = []
+        while i < len(names) and names[i].startswith(prefix):
+            matches.append(names[i])
+            i += 1
+        return matches
+
+    def complete_value(self, name, prefix):
+        value = self.values.get(name)
+        if value is not None and value.startswith(prefix):
+            return [value]
+        return []
+
+
+class CompletionCache:
+    """
+    Read-only completion index stored in a file, with the same queries as CompletionIndex.
+
+    The file is memory-mapped and searched in place, so opening it costs the same however many names it
+    holds. Layout (little endian)::
+
+        magic, u32 format version, u32 name count, u32 meta length, meta (JSON),
+        (count + 1) x u32 entry offsets relative to the first entry,
+        entries sorted by name: u8 flags, u16 name length, name, value (up to the next entry)
+
+    ``meta`` records the server build (``version`` and ``protocol`` from status) the completions came from.
+    """
+    MAGIC = b'DPRCIDX\0'
+    VERSION = 1
+    HEADER = struct.Struct('<8sIII')
+    OFFSET = struct.Struct('<I')
+    ENTRY = struct.Struct('<BH')
+    HAS_VALUE = 0x80
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, meta_length = self.HEADER.unpack_from(self.mm, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.mm.close()
+            raise ValueError('{} is not a completion cache'.format(path))
+        meta_start = self.HEADER.size
+        self.meta = json.loads(self.mm[meta_start:meta_start + meta_length].decode('utf8'))
+        self.offsets_start = meta_start + meta_length
+        self.entries_start = self.offsets_start + (self.count + 1) * self.OFFSET.size
+        self.names = CachedNames(self)
+
+    @classmethod
+    def is_cache(cls, path):
+        with open(path, 'rb') as f:
+            return f.read(len(cls.MAGIC)) == cls.MAGIC
+
+    @classmethod
+    def write(cls, path, completions, meta=None):
+        types = {}
+        for bit, type_ in enumerate(COMPLETION_TYPES):
+            for name in completions.get(type_) or {}:
+                types[name] = types.get(name, 0) | 1 << bit
+        values = completions.get('cvar') or {}
+        entries = []
+        for name in sorted(types, key=lambda i: i.encode('utf8')):
+            encoded = name.encode('utf8')
+            flags = types[name]
+            value = values.get(name)
+            if value is not None:
+                flags |= cls.HAS_VALUE
+            entries.append(cls.ENTRY.pack(flags, len(encoded)) + encoded +
+                           (value.encode('utf8') if value is not None else b''))
+        meta = json.dumps(meta or {}).encode('utf8')
+        offsets = [0]
+        for entry in entries:
+            offsets.append(offsets[-1] + len(entry))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(entries), len(meta)))
+            f.write(meta)
+            f.write(b''.join(cls.OFFSET.pack(i) for i in offsets))
+            f.write(b''.join(entries))
+        os.replace(tmp_path, path)
+
+    def close(self):
+        self.mm.close()
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, i):
+        start = self.entries_start + self.OFFSET.unpack_from(self.mm, self.offsets_start + i * self.OFFSET.size)[0]
+        end = self.entries_start + self.OFFSET.unpack_from(self.mm, self.offsets_start + (i + 1) * self.OFFSET.size)[0]
+        flags, name_length = self.ENTRY.unpack_from(self.mm, start)
+        name_start = start + self.ENTRY.size
+        return flags, self.mm[name_start:name_start + name_length], name_start + name_length, end
+
+    def complete(self, prefix):
+        prefix = prefix.encode('utf8')
+        i = bisect_left(self.names, prefix)
+        matches = []
+        while i < self.count:
+            name = self.names[i]
+            if not name.startswith(prefix):
+                break
+            matches.append(name.decode('utf8'))
+            i += 1
+        return matches
+
+    def complete_value(self, name, prefix):
+        encoded = name.encode('utf8')
+        i = bisect_left(self.names, encoded)
+        if i == self.count:
+            return []
+        flags, found, value_start, value_end = self.entry(i)
+        if found != encoded or not flags & self.HAS_VALUE:
+            return []
+        value = self.mm[value_start:value_end].decode('utf8')
+        return [value] if value.startswith(prefix) else []
+
+
+class CachedNames:
+    """
+    Sequence of the encoded names of a CompletionCache, for bisect
+    """
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __len__(self):
+        return self.cache.count
+
+    def __getitem__(self, i):
+        return self.cache.entry(i)[1]
+
+
+class MergedCompletions:
+    """
+    Queries several indexes (e.g. the CompletionCache of a server and the CompletionIndex of what the client
+    learned since) as one. complete_value answers from the first index that knows the name.
+    """
+    def __init__(self, *indexes):
+        self.indexes = indexes
+
+    def complete(self, prefix):
+        matches = []
+        for name in heapq.merge(*[i.complete(prefix) for i in self.indexes]):
+            if not matches or matches[-1] != name:
+                matches.append(name)
+        return matches
+
+    def complete_value(self, name, prefix):
+        for index in self.indexes:
+            matches = index.complete_value(name, prefix)
+            if matches:
+                return matches
+        return []
@@ -1,11 +1,8 @@
-import json
 import os
 import re
 
-import asyncio
 import yaml
 
-from aio_dprcon.client import RconClient
 from .exceptions import InvalidConfigException
 
 
@@ -29,18 +26,24 @@ class ServerConfigItem:
     def get_completion_cache_path(self):
         return os.path.expanduser('~/.config/aio_dprcon/completions.{}'.format(self.name))
 
-    def update_completions(self, completions):
-        path = self.get_completion_cache_path()
-        with open(path, 'w') as f:
-            f.write(json.dumps(completions))
+    def update_completions(self, completions, meta=None):
+        from .completion import CompletionCache
+        CompletionCache.write(self.get_completion_cache_path(), completions, meta)
 
     def load_completions(self):
+        """
+        Returns the cached completions as CompletionCache, or None if there's no cache
+        """
+        from .completion import CompletionIndex, CompletionCache
         path = self.get_completion_cache_path()
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                return json.loads(f.read())
-        else:
+        if not os.path.exists(path):
             return None
+        if CompletionCache.is_cache(path):
+            return CompletionCache(path)
+        # Cache written by an older version
+        import json
+        with open(path, 'r') as f:
+            return CompletionIndex(json.loads(f.read()))
 
     @classmethod
     def from_dict(cls, name, d):
@@ -75,12 +78,17 @@ class ServerConfigItem:
         return dict([(field[0], getattr(self, field[0])) for field in self.fields[1:]])
 
     def get_client(self, loop=None):
+        import asyncio
+        from .client import RconClient
         return RconClient(loop or asyncio.get_event_loop(),
                           self.host,
                           self.port,
                           password=self.password,
                           secure=self.secure)
 
+    def add_to_pool(self, pool):
+        return pool.add_server(self.name, self.host, self.port, password=self.password, secure=self.secure)
+
 
 class Config:
     def __init__(self):
@@ -0,0 +1,196 @@
+"""
+Typed Xonotic eventlog events (sv_eventlog 1)
+
+Every eventlog line looks like ``:kind:field:field...``. Known kinds are parsed into small namedtuple based
+classes, unknown ones into a generic Event(kind, fields). All event classes have a ``kind`` attribute.
+"""
+import asyncio
+from collections import namedtuple
+
+__all__ = ['Event', 'JoinEvent', 'PartEvent', 'NameEvent', 'TeamEvent', 'KillEvent', 'GameStartEvent',
+           'ScoresEvent', 'PlayerScoresEvent', 'TeamScoresEvent', 'EndEvent', 'GameOverEvent', 'parse_event',
+           'EventStream', 'ALL_EVENTS']
+
+
+class Event(namedtuple('Event', 'kind,fields')):
+    __slots__ = ()
+
+
+class JoinEvent(namedtuple('JoinEvent', 'player_id,slot,ip,nick')):
+    __slots__ = ()
+    kind = 'join'
+
+    @classmethod
+    def from_fields(cls, payload):
+        player_id, slot, ip, nick = payload.split(':', 3)
+        return cls(int(player_id), int(slot), ip, nick)
+
+
+class PartEvent(namedtuple('PartEvent', 'player_id')):
+    __slots__ = ()
+    kind = 'part'
+
+    @classmethod
+    def from_fields(cls, payload):
+        return cls(int(payload))
+
+
+class NameEvent(namedtuple('NameEvent', 'player_id,nick')):
+    __slots__ = ()
+    kind = 'name'
+
+    @classmethod
+    def from_fields(cls, payload):
+        player_id, nick = payload.split(':', 1)
+        return cls(int(player_id), nick)
+
+
+class TeamEvent(namedtuple('TeamEvent', 'player_id,team,reason')):
+    __slots__ = ()
+    kind = 'team'
+
+    @classmethod
+    def from_fields(cls, payload):
+        player_id, team, reason = (payload.split(':', 2) + [''])[:3]
+        return cls(int(player_id), int(team), reason)
+
+
+class KillEvent(namedtuple('KillEvent', 'type,killer,victim,attributes')):
+    """
+    type is one of frag, tk, suicide, accident; attributes holds the key=value pairs (weapon type, items)
+    """
+    __slots__ = ()
+    kind = 'kill'
+
+    @classmethod
+    def from_fields(cls, payload):
+        type_, killer, victim, *rest = payload.split(':', 3)
+        attributes = dict(i.split('=', 1) for i in rest[0].split(':') if '=' in i) if rest else {}
+        return cls(type_, int(killer), int(victim), attributes)
+
+
+def split_gametype_map(value):
+    gametype, _, map_ = value.partition('_')
+    return gametype, map_
+
+
+class GameStartEvent(namedtuple('GameStartEvent', 'gametype,map,match_id')):
+    __slots__ = ()
+    kind = 'gamestart'
+
+    @classmethod
+    def from_fields(cls, payload):
+        gametype_map, _, match_id = payload.partition(':')
+        return cls(*split_gametype_map(gametype_map), match_id=match_id)
+
+
+class ScoresEvent(namedtuple('ScoresEvent', 'gametype,map,duration')):
+    __slots__ = ()
+    kind = 'scores'
+
+    @classmethod
+    def from_fields(cls, payload):
+        gametype_map, _, duration = payload.partition(':')
+        return cls(*split_gametype_map(gametype_map), duration=int(duration or 0))
+
+
+class PlayerScoresEvent(namedtuple('PlayerScoresEvent', 'scores,playtime,team,player_id,nick')):
+    """
+    A row of the end of match scoreboard, scores are in the order of the preceding :labels:player: line
+    """
+    __slots__ = ()
+    kind = 'player'
+
+    @classmethod
+    def from_fields(cls, payload):
+        _, scores, playtime, team, player_id, nick = payload.split(':', 5)
+        return cls([int(i) if i else 0 for i in scores.split(',')], int(playtime), int(team), int(player_id), nick)
+
+
+class TeamScoresEvent(namedtuple('TeamScoresEvent', 'scores,team')):
+    __slots__ = ()
+    kind = 'teamscores'
+
+    @classmethod
+    def from_fields(cls, payload):
+        _, scores, team = payload.split(':', 2)
+        return cls([int(i) if i else 0 for i in scores.split(',')], int(team))
+
+
+class EndEvent(namedtuple('EndEvent', '')):
+    __slots__ = ()
+    kind = 'end'
+
+    @classmethod
+    def from_fields(cls, payload):
+        return cls()
+
+
+class GameOverEvent(namedtuple('GameOverEvent', '')):
+    __slots__ = ()
+    kind = 'gameover'
+
+    @classmethod
+    def from_fields(cls, payload):
+        return cls()
+
+
+EVENT_CLASSES = dict((i.kind.encode('utf8'), i) for i in (
+    JoinEvent, PartEvent, NameEvent, TeamEvent, KillEvent, GameStartEvent, ScoresEvent, PlayerScoresEvent,
+    TeamScoresEvent, EndEvent, GameOverEvent
+))
+
+
+def parse_event(kind, payload):
+    """
+    kind and payload are the bytes before and after the second colon of an eventlog line
+    """
+    cls = EVENT_CLASSES.get(kind)
+    payload = payload.decode('utf8', 'replace')
+    if cls is None:
+        return Event(kind.decode('utf8', 'replace'), payload.split(':') if payload else [])
+    return cls.from_fields(payload)
+
+
+class AllEvents:
+    def __contains__(self, item):
+        return True
+
+
+ALL_EVENTS = AllEvents()
+
+
+class EventStream:
+    """
+    Asynchronous iterator over the events of one RconClient, created by RconClient.events().
+
+    Events arriving while the queue holds ``maxsize`` events are dropped and counted in ``dropped``.
+    """
+    def __init__(self, client, kinds=None, maxsize=1000):
+        self.client = client
+        self.kinds = frozenset(kinds) if kinds else None
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        if self.kinds is not None and event.kind not in self.kinds:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def close(self):
+        self.client.remove_event_stream(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
@@ -0,0 +1,165 @@
+"""
+Standalone log collector
+
+LogListener receives the logs of many servers on one UDP port (an RconPool log socket), keeps every server's
+``log_dest_udp`` pointing at it and serves the log lines to any number of local consumers over a Unix socket.
+Consumers read lines of the form ``SERVER_NAME LOG_LINE\\n``. A consumer that doesn't keep up loses lines rather
+than slowing down the listener, the number of lost lines is logged when it disconnects.
+"""
+import asyncio
+import logging
+import os
+
+from .exceptions import RconCommandFailed
+from .metrics import start_prometheus_server
+from .pool import RconPool
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['LogListener', 'DEFAULT_LOG_PORT', 'DEFAULT_SOCKET_PATH']
+
+DEFAULT_LOG_PORT = 26100
+DEFAULT_SOCKET_PATH = os.path.expanduser('~/.config/aio_dprcon/listener.sock')
+
+
+class ListenerSink:
+    """
+    Log sink of a single server, splits its log into lines and publishes them to the listener
+    """
+    def __init__(self, listener, name):
+        self.listener = listener
+        self.prefix = name.encode('utf8') + b' '
+        self.buffer = bytearray()
+
+    def write(self, data):
+        lines = data.split(b'\n')
+        if len(lines) == 1:
+            self.buffer += data
+            return
+        buf = self.buffer
+        if buf:
+            buf += lines[0]
+            lines[0] = bytes(buf)
+            buf.clear()
+        buf += lines.pop()
+        prefix = self.prefix
+        self.listener.publish(b''.join(prefix + line + b'\n' for line in lines))
+
+    def close(self):
+        pass
+
+
+class LogConsumer:
+    def __init__(self, writer):
+        self.writer = writer
+        self.dropped = 0
+
+
+class LogListener:
+    def __init__(self, loop, log_listener_ip, log_listener_port=DEFAULT_LOG_PORT, socket_path=DEFAULT_SOCKET_PATH,
+                 poll_status_interval=6, registration_interval=60, max_consumer_buffer=1 << 20, batch=True,
+                 metrics_port=None):
+        self.loop = loop
+        # Serve the metrics of all servers in the Prometheus format on this local port
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        self.socket_path = socket_path
+        self.registration_interval = registration_interval
+        self.max_consumer_buffer = max_consumer_buffer
+        self.pool = RconPool(loop, poll_status_interval=poll_status_interval, log_listener_ip=log_listener_ip,
+                             log_listener_port=log_listener_port, batch=batch)
+        self.consumers = []
+        self.server = None
+
+    def add_server(self, name, remote_host, remote_port, password=None, secure=0):
+        return self.pool.add_server(name, remote_host, remote_port, password=password, secure=secure,
+                                    log_sink=ListenerSink(self, name))
+
+    def publish(self, data):
+        max_buffer = self.max_consumer_buffer
+        for consumer in self.consumers:
+            transport = consumer.writer.transport
+            if transport.get_write_buffer_size() > max_buffer:
+                consumer.dropped += data.count(b'\n')
+            else:
+                transport.write(data)
+
+    async def handle_consumer(self, reader, writer):
+        consumer = LogConsumer(writer)
+        self.consumers.append(consumer)
+        try:
+            # Consumers don't send anything, reading only notices that they disconnected
+            while await reader.read(4096):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.consumers.remove(consumer)
+            if consumer.dropped:
+                logger.warning('Consumer disconnected, %s lines were dropped for it', consumer.dropped)
+            writer.close()
+
+    async def check_registration(self, client):
+        """
+        Adds the listener to the server's ``log_dest_udp`` if it's missing there (e.g. after a server restart)
+        """
+        try:
+            await client.execute_with_retry('log_dest_udp', 'log_dest_udp')
+        except RconCommandFailed:
+            return False
+        if client.log_protocol is None:
+            # Reconnecting meanwhile, the new log channel subscribes itself
+            return False
+        entry = '{}:{}'.format(self.pool.log_listener_ip, client.log_protocol.local_port)
+        if entry not in client.cvars['log_dest_udp'].split(' '):
+            logger.info('Log destination missing on %s:%s, registering again', client.remote_host, client.remote_port)
+            client.subscribe_to_log()
+            return False
+        return True
+
+    async def check_registrations(self):
+        """
+        Checks the registration on every connected server, an error on one of them is logged and doesn't stop
+        the others
+        """
+        clients = [client for client in self.pool.clients.values()
+                   if client.connected and client.log_protocol is not None]
+        results = await asyncio.gather(*[self.check_registration(client) for client in clients],
+                                       return_exceptions=True)
+        for client, result in zip(clients, results):
+            if isinstance(result, Exception):
+                logger.warning('Could not check the log destination on %s:%s', client.remote_host,
+                               client.remote_port, exc_info=result)
+
+    async def check_registrations_forever(self):
+        while True:
+            await asyncio.sleep(self.registration_interval)
+            await self.check_registrations()
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self.handle_consumer, path=self.socket_path)
+        if self.metrics_port is not None:
+            self.metrics_server = await start_prometheus_server(self.pool.metrics_registries, port=self.metrics_port)
+        await self.pool.open(log=True)
+
+    async def run_forever(self):
+        await self.start()
+        try:
+            await asyncio.gather(self.pool.connect_forever(connect_log=True), self.check_registrations_forever())
+        finally:
+            self.close()
+
+    def close(self):
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        for consumer in self.consumers:
+            consumer.writer.close()
+        self.pool.close()
@@ -0,0 +1,81 @@
+"""
+Pure Python MD4 (RFC 1320), used when hashlib doesn't provide it (OpenSSL 3 moved MD4 to the legacy provider)
+"""
+import struct
+
+__all__ = ['MD4']
+
+MASK = 0xFFFFFFFF
+BLOCK = struct.Struct('<16I')
+
+
+def rotl(x, n):
+    return ((x << n) | (x >> (32 - n))) & MASK
+
+
+def compress(state, block):
+    a, b, c, d = state
+    x = BLOCK.unpack(block)
+    # Round 1
+    for i in (0, 4, 8, 12):
+        a = rotl((a + ((b & c) | (~b & d)) + x[i]) & MASK, 3)
+        d = rotl((d + ((a & b) | (~a & c)) + x[i + 1]) & MASK, 7)
+        c = rotl((c + ((d & a) | (~d & b)) + x[i + 2]) & MASK, 11)
+        b = rotl((b + ((c & d) | (~c & a)) + x[i + 3]) & MASK, 19)
+    # Round 2
+    for i in (0, 1, 2, 3):
+        a = rotl((a + ((b & c) | (b & d) | (c & d)) + x[i] + 0x5A827999) & MASK, 3)
+        d = rotl((d + ((a & b) | (a & c) | (b & c)) + x[i + 4] + 0x5A827999) & MASK, 5)
+        c = rotl((c + ((d & a) | (d & b) | (a & b)) + x[i + 8] + 0x5A827999) & MASK, 9)
+        b = rotl((b + ((c & d) | (c & a) | (d & a)) + x[i + 12] + 0x5A827999) & MASK, 13)
+    # Round 3
+    for i in (0, 2, 1, 3):
+        a = rotl((a + (b ^ c ^ d) + x[i] + 0x6ED9EBA1) & MASK, 3)
+        d = rotl((d + (a ^ b ^ c) + x[i + 8] + 0x6ED9EBA1) & MASK, 9)
+        c = rotl((c + (d ^ a ^ b) + x[i + 4] + 0x6ED9EBA1) & MASK, 11)
+        b = rotl((b + (c ^ d ^ a) + x[i + 12] + 0x6ED9EBA1) & MASK, 15)
+    return [(state[0] + a) & MASK, (state[1] + b) & MASK, (state[2] + c) & MASK, (state[3] + d) & MASK]
+
+
+class MD4:
+    """
+    hashlib compatible MD4 object
+    """
+    name = 'md4'
+    digest_size = 16
+    block_size = 64
+
+    def __init__(self, data=b''):
+        self.state = [0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476]
+        self.buffer = b''
+        self.length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        self.length += len(data)
+        buffer = self.buffer + data
+        state = self.state
+        end = len(buffer) - len(buffer) % 64
+        for i in range(0, end, 64):
+            state = compress(state, buffer[i:i + 64])
+        self.state = state
+        self.buffer = buffer[end:]
+
+    def copy(self):
+        other = MD4.__new__(MD4)
+        other.state = list(self.state)
+        other.buffer = self.buffer
+        other.length = self.length
+        return other
+
+    def digest(self):
+        padding = b'\x80' + b'\x00' * ((55 - self.length) % 64) + struct.pack('<Q', self.length * 8 & (2 ** 64 - 1))
+        state = self.state
+        tail = self.buffer + padding
+        for i in range(0, len(tail), 64):
+            state = compress(state, tail[i:i + 64])
+        return struct.pack('<4I', *state)
+
+    def hexdigest(self):
+        return self.digest().hex()
@@ -0,0 +1,188 @@
+"""
+Client metrics and tracing hooks
+
+Every RconClient records its counters and latency histograms in a ClientMetrics registry (``client.metrics``).
+Recording is an attribute increment or a bisect, cheap enough for the per-datagram paths. snapshot() returns
+plain values; format_prometheus() and start_prometheus_server() expose registries in the Prometheus text format.
+
+Tracing is opt-in: set ``client.tracer`` to a Tracer subclass to be called around send, receive and parse.
+While no tracer is set the hooks cost a single ``is None`` test.
+"""
+import asyncio
+import bisect
+import math
+
+__all__ = ['Counter', 'Histogram', 'CallbackMetric', 'Metrics', 'ClientMetrics', 'Tracer', 'format_prometheus',
+           'start_prometheus_server', 'LATENCY_BUCKETS']
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Counter:
+    __slots__ = ('name', 'help', 'value')
+    kind = 'counter'
+
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    __slots__ = ('name', 'help', 'bounds', 'counts', 'sum', 'count')
+    kind = 'histogram'
+
+    def __init__(self, name, help='', buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(buckets)
+        # counts[i] is the number of values in (bounds[i - 1], bounds[i]], the last one counts values above all bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """
+        Returns {'buckets': [(upper bound, cumulative count)...], 'sum': ..., 'count': ...}
+        """
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.bounds + (math.inf, ), self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class CallbackMetric:
+    """
+    A counter or gauge whose value is computed by ``func`` when it is read
+    """
+    __slots__ = ('name', 'help', 'func', 'kind')
+
+    def __init__(self, name, func, help='', kind='gauge'):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.kind = kind
+
+    def snapshot(self):
+        return self.func()
+
+
+class Metrics:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError('Metric {} is already registered'.format(metric.name))
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help=''):
+        return self.register(Counter(name, help))
+
+    def histogram(self, name, help='', buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, buckets))
+
+    def callback(self, name, func, help='', kind='gauge'):
+        return self.register(CallbackMetric(name, func, help, kind))
+
+    def snapshot(self):
+        return dict((name, metric.snapshot()) for name, metric in self.metrics.items())
+
+
+class ClientMetrics(Metrics):
+    def __init__(self):
+        super().__init__()
+        self.commands_sent = self.counter('commands_sent_total', 'Rcon packets sent')
+        self.cmd_packets_received = self.counter('cmd_packets_received_total', 'Command channel datagrams received')
+        self.log_packets_received = self.counter('log_packets_received_total', 'Log channel datagrams received')
+        self.bytes_received = self.counter('bytes_received_total', 'Rcon response bytes received')
+        self.packets_dropped = self.counter('packets_dropped_total', 'Datagrams dropped for their source address')
+        self.command_rtt = self.histogram('command_rtt_seconds', 'Time from sending a command to its response')
+        self.command_timeouts = self.counter('command_timeouts_total', 'Commands not answered in time')
+        self.retries = self.counter('retries_total', 'Commands sent again by execute_with_retry')
+        self.retries_exceeded = self.counter('retries_exceeded_total', 'execute_with_retry calls that failed')
+        self.parse_seconds = self.histogram('parse_seconds', 'Time spent parsing a datagram (or a batch)')
+
+
+class Tracer:
+    """
+    Base class of tracing hooks, all of them do nothing
+    """
+    def send(self, client, command):
+        pass
+
+    def receive(self, client, channel, data, addr):
+        pass
+
+    def parse(self, client, channel, data, seconds):
+        pass
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_prometheus(registries, prefix='dprcon_', label='server'):
+    """
+    Formats ``registries``, a dict {label value: Metrics}, in the Prometheus text exposition format
+    """
+    lines = []
+    samples = {}
+    for label_value, registry in registries.items():
+        escaped = str(label_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        labels = '{}="{}"'.format(label, escaped)
+        for metric in registry.metrics.values():
+            samples.setdefault(metric.name, []).append((labels, metric))
+    for name, items in samples.items():
+        full_name = prefix + name
+        metric = items[0][1]
+        if metric.help:
+            lines.append('# HELP {} {}'.format(full_name, metric.help))
+        lines.append('# TYPE {} {}'.format(full_name, metric.kind))
+        for labels, metric in items:
+            value = metric.snapshot()
+            if metric.kind == 'histogram':
+                for bound, count in value['buckets']:
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(full_name, labels, format_value(bound), count))
+                lines.append('{}_sum{{{}}} {}'.format(full_name, labels, format_value(value['sum'])))
+                lines.append('{}_count{{{}}} {}'.format(full_name, labels, value['count']))
+            else:
+                lines.append('{}{{{}}} {}'.format(full_name, labels, format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+
+async def start_prometheus_server(get_registries, host='127.0.0.1', port=9260):
+    """
+    Serves format_prometheus(get_registries()) over HTTP on every path, returns the asyncio Server
+    """
+    async def __handle(reader, writer):
+        try:
+            # Skip the request line and headers, every request gets the metrics
+            while (await reader.readline()).strip():
+                pass
+            body = format_prometheus(get_registries()).encode('utf8')
+            writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n'
+                         b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+            await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(__handle, host, port)
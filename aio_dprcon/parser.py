@@ -1,6 +1,9 @@
 import logging
 import re
 
+from .events import parse_event
+from .status import PlayerStatus, parse_player_time
+
 logger = logging.getLogger(__name__)
 
 
@@ -8,21 +11,27 @@ class BaseOneLineParser:
     key = b''
     started = False
     finished = True
+    # Number of lines process() raised on
+    errors = 0
 
     def __init__(self, rcon_server):
         self.rcon_server = rcon_server
 
-    def parse(self, lines):
-        if not lines:
-            return lines
-        if lines[0].startswith(self.key):
-            try:
-                self.process(lines[0][len(self.key):])
-            except:
-                logger.warning('Exception during parsing line %r', lines[0], exc_info=True)
-            return lines[1:]
-        else:
-            return lines
+    def parse_line(self, line):
+        if not line.startswith(self.key):
+            return False
+        try:
+            self.process(line[len(self.key):])
+        except:
+            self.errors += 1
+            logger.warning('Exception during parsing line %r', line, exc_info=True)
+        return True
+
+    def dispatch_pattern(self):
+        return re.escape(self.key)
+
+    def reset(self):
+        pass
 
     def process(self, data):
         raise NotImplementedError  # pragma: no cover
@@ -32,22 +41,30 @@ class BaseOneLineRegexParser:
     regex = None
     started = False
     finished = True
+    errors = 0
 
     def __init__(self, rcon_server):
         self.rcon_server = rcon_server
 
-    def parse(self, lines):
-        if not lines:
-            return lines
-        m = self.regex.match(lines[0])
+    def parse_line(self, line):
+        m = self.regex.match(line)
         if m is None:
-            return lines
-        else:
-            try:
-                self.process(m)
-            except:
-                logger.warning('Exception during parsing line %r', lines[0], exc_info=True)
-            return lines[1:]
+            return False
+        try:
+            self.process(m)
+        except:
+            self.errors += 1
+            logger.warning('Exception during parsing line %r', line, exc_info=True)
+        return True
+
+    def dispatch_pattern(self):
+        if self.regex.flags & ~re.ASCII or self.regex.groupindex:
+            # Can't be merged into the dispatch regex without changing its meaning
+            return None
+        return self.regex.pattern
+
+    def reset(self):
+        pass
 
     def process(self, data):
         raise NotImplementedError  # pragma: no cover
@@ -57,80 +74,128 @@ class BaseMultilineParser:
     key = b''
     is_multiline = False
     terminator = b''
+    errors = 0
 
     def __init__(self, rcon_server):
         self.rcon_server = rcon_server
+        self.reset()
+
+    def dispatch_pattern(self):
+        return re.escape(self.key)
+
+    def reset(self):
         self.started = False
         self.finished = False
         self.received_eol = False
         self.lines = []
 
-    def parse(self, lines):
-        if not lines:
-            return lines
-        if self.started:
-            line = lines.pop(0)
-            while not line.startswith(self.terminator):
-                self.lines.append(line)
-                if not lines:
-                    return []
-                else:
-                    line = lines.pop(0)
+    def parse_line(self, line):
+        if not self.started:
+            if not line.startswith(self.key):
+                return False
+            self.lines.append(line[len(self.key):])
+            self.started = True
+        elif line.startswith(self.terminator):
             try:
                 self.process(self.lines)
             except:
+                self.errors += 1
                 logger.warning('Exception during parsing multiline %r', self.lines, exc_info=True)
             self.finished = True
-            return lines
         else:
-            if lines[0].startswith(self.key):
-                self.lines.append(lines.pop(0)[len(self.key):])
-                self.started = True
-                return self.parse(lines)
-            else:
-                return lines
+            self.lines.append(line)
+        return True
 
     def process(self, data):
         raise NotImplementedError  # pragma: no cover
 
 
 class CombinedParser:
+    """
+    Splits the incoming stream into lines and hands every line to the first parser accepting it.
+
+    Parsers are instantiated once; a multi-line parser that has started receives all following lines until it
+    finishes, then it is reset for reuse. The patterns of all parsers are merged into a single alternation of
+    named groups, so a line is classified by one regex match and only the matching parser looks at it again.
+    """
     parsers = []
 
     def __init__(self, rcon_server, parsers=None, dump_to=None):
         self.rcon_server = rcon_server
-        self.current = b''
+        # The incomplete last line of the stream
+        self.buffer = bytearray()
+        # Number of complete lines fed so far
+        self.lines = 0
         self.active_parser = None
         if parsers:
             self.parsers = parsers
+        self.parser_instances = [i(rcon_server) for i in self.parsers]
+        self.dispatch, self.dispatch_targets = self.compile_dispatch(self.parser_instances)
         self.dump_to = dump_to
 
+    @staticmethod
+    def compile_dispatch(parsers):
+        patterns = [parser.dispatch_pattern() for parser in parsers]
+        if not parsers or None in patterns:
+            return None, None
+        regex = re.compile(b'|'.join(b'(?P<p%d>%s)' % (i, pattern) for i, pattern in enumerate(patterns)))
+        return regex.match, dict(('p%d' % i, parser) for i, parser in enumerate(parsers))
+
     def feed(self, data):
         if self.dump_to:
             self.dump_to.write(data)
-        self.current += data
-        self.parse()
-
-    def parse(self):
-        *lines, self.current = self.current.split(b'\n')
-        if self.active_parser:
-            lines = self.active_parser.parse(lines)
-            if self.active_parser.finished:
+        lines = data.split(b'\n')
+        buf = self.buffer
+        if len(lines) == 1:
+            buf += data
+            return
+        if buf:
+            buf += lines[0]
+            lines[0] = bytes(buf)
+            buf.clear()
+        buf += lines.pop()
+        self.lines += len(lines)
+        parse_line = self.parse_line
+        for line in lines:
+            parse_line(line)
+
+    @property
+    def errors(self):
+        """
+        Number of lines (or multi-line blocks) the parsers failed to process
+        """
+        return sum(parser.errors for parser in self.parser_instances)
+
+    def feed_many(self, chunks):
+        """
+        Feeds consecutive chunks of the stream, e.g. a batch of datagrams, at once
+        """
+        if len(chunks) == 1:
+            self.feed(chunks[0])
+        elif chunks:
+            self.feed(b''.join(chunks))
+
+    def parse_line(self, line):
+        active = self.active_parser
+        if active is not None:
+            active.parse_line(line)
+            if active.finished:
+                active.reset()
                 self.active_parser = None
-        while lines:
-            prev_len = len(lines)
-            for i in self.parsers:
-                parser = i(self.rcon_server)
-                lines = parser.parse(lines)
-                if parser.started and (not parser.finished):
+            return
+        if self.dispatch is not None:
+            m = self.dispatch(line)
+            if m is None:
+                return
+            parsers = (self.dispatch_targets[m.lastgroup], )
+        else:
+            parsers = self.parser_instances
+        for parser in parsers:
+            if parser.parse_line(line):
+                if parser.started and not parser.finished:
                     self.active_parser = parser
-                    if lines:
-                        logger.error('A multi-line parser %r has not finished but left some lines %r',
-                                     parser, lines)
-                    else:
-                        logger.debug('Waiting for more input for parser %r', parser)
-            if len(lines) == prev_len:
-                lines.pop(0)
+                    logger.debug('Waiting for more input for parser %r', parser)
+                return
 
 
 class StatusItemParser(BaseOneLineRegexParser):
@@ -140,21 +205,54 @@ class StatusItemParser(BaseOneLineRegexParser):
         key = data.group(1).decode('utf8')
         value = data.group(2).decode('utf8')
         self.rcon_server.status[key] = value
+        self.rcon_server.key_received('status', key)
+
+
+class StatusTableHeaderParser(BaseOneLineRegexParser):
+    regex = re.compile(rb'^\^2IP\s+%pl\s+ping\s+time\s+frags\s+no\s+name')
+
+    def process(self, data):
+        status = self.rcon_server.status
+        status.start_players()
+        if status.complete:
+            self.rcon_server.status_received()
+
+
+class StatusPlayerParser(BaseOneLineRegexParser):
+    regex = re.compile(rb'^\^[37](\S+)\s+(-?\d+)\s+(-?\d+)\s+(\d+(?::\d+)+)\s+(-?\d+)\s+#(\d+)\s*\^7(.*)$')
+
+    def process(self, data):
+        status = self.rcon_server.status
+        status.add_player(PlayerStatus(
+            slot=int(data.group(6)),
+            ip=data.group(1).decode('utf8'),
+            packet_loss=int(data.group(2)),
+            ping=int(data.group(3)),
+            time=parse_player_time(data.group(4).decode('utf8')),
+            frags=int(data.group(5)),
+            name=data.group(7).decode('utf8')
+        ))
+        if status.complete:
+            self.rcon_server.status_received()
 
 
 class CvarParser(BaseOneLineRegexParser):
     regex = re.compile(rb'^"(\w+)" is "([^"]*)"')
 
     def process(self, data):
-        self.rcon_server.cvars[data.group(1).decode('utf8')] = data.group(2).decode('utf8')
+        name = data.group(1).decode('utf8')
+        self.rcon_server.cvars[name] = data.group(2).decode('utf8')
+        self.rcon_server.key_received('cvars', name)
 
 
 class CvarListParser(BaseOneLineRegexParser):
-    regex = re.compile(rb'^(\S+) is')
+    regex = re.compile(rb'^(\S+) is(?: "([^"]*)")?')
 
     def process(self, data):
         var = data.group(1).decode('utf8')
-        self.rcon_server.completions['cvar'][var] = None
+        val = data.group(2)
+        self.rcon_server.completions['cvar'][var] = None if val is None else val.decode('utf8')
+        self.rcon_server.completions_dirty = True
 
 
 class AliasListParser(BaseOneLineRegexParser):
@@ -163,6 +261,7 @@ class AliasListParser(BaseOneLineRegexParser):
     def process(self, data):
         name = data.group(1).decode('utf8')
         self.rcon_server.completions['alias'][name] = None
+        self.rcon_server.completions_dirty = True
 
 
 class CmdListParser(BaseOneLineRegexParser):
@@ -171,6 +270,7 @@ class CmdListParser(BaseOneLineRegexParser):
     def process(self, data):
         name = data.group(1).decode('utf8')
         self.rcon_server.completions['command'][name] = None
+        self.rcon_server.completions_dirty = True
 
 
 class AproposCvarParser(BaseOneLineRegexParser):
@@ -180,6 +280,7 @@ class AproposCvarParser(BaseOneLineRegexParser):
         var = data.group(1).decode('utf8')
         val = data.group(2).decode('utf8')
         self.rcon_server.completions['cvar'][var] = val
+        self.rcon_server.completions_dirty = True
 
 
 class AproposAliasCommandParser(BaseOneLineRegexParser):
@@ -190,10 +291,24 @@ class AproposAliasCommandParser(BaseOneLineRegexParser):
         name = data.group(2).decode('utf8')
         description = data.group(3).decode()
         self.rcon_server.completions[type_][name] = description
+        self.rcon_server.completions_dirty = True
 
 
 class ResultsParser(BaseOneLineRegexParser):
-    regex = re.compile(rb'^\d+ results$')
+    # The trailer of apropos, cvarlist and cmdlist: "12 results", "3 cvars beginning with "g_"", "1 Command"
+    regex = re.compile(rb'^(\d+) (?:result|cvar|[Cc]ommand)')
+
+    def process(self, data):
+        self.rcon_server.results = int(data.group(1))
+
+
+class EventLogParser(BaseOneLineParser):
+    key = b':'
 
     def process(self, data):
-        print(data.group(0))
+        end = data.find(b':')
+        kind = data if end < 0 else data[:end]
+        # Most of the stream is usually not wanted, don't decode or allocate events for it
+        if kind not in self.rcon_server.event_kinds:
+            return
+        self.rcon_server.event_received(parse_event(kind, b'' if end < 0 else data[end + 1:]))
@@ -0,0 +1,219 @@
+import asyncio
+import ipaddress
+import socket
+from collections import namedtuple
+
+from .batch import create_batch_datagram_endpoint
+from .client import RconClient
+from .exceptions import RconCommandFailed
+from .protocol import RconProtocol, RCON_NOSECURE
+
+__all__ = ['RconPool', 'BroadcastResult']
+
+
+# error is None when the command completed, otherwise response holds whatever output was received
+BroadcastResult = namedtuple('BroadcastResult', 'name,response,error')
+
+
+class RconRouterProtocol(asyncio.DatagramProtocol):
+    """
+    Owns a socket shared by many servers and hands each datagram to the protocol registered for its source address
+    """
+    def __init__(self, loop):
+        self.transport = None
+        self.routes = {}
+        self.ready = loop.create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.ready.set_result(transport)
+
+    def datagram_received(self, data, addr):
+        protocol = self.routes.get(addr[:2])
+        if protocol is not None:
+            protocol.datagram_received(data, addr)
+
+    def datagrams_received(self, datagrams):
+        # Split the batch by server, keeping the order of each server's datagrams
+        batches = {}
+        for datagram in datagrams:
+            key = datagram[1][:2]
+            batch = batches.get(key)
+            if batch is None:
+                batches[key] = [datagram]
+            else:
+                batch.append(datagram)
+        for key, batch in batches.items():
+            protocol = self.routes.get(key)
+            if protocol is not None:
+                protocol.datagrams_received(batch)
+
+    def error_received(self, exc):
+        pass
+
+
+class RconPool:
+    """
+    Manages many servers from one event loop over a single command socket (and a single log socket).
+
+    Servers are added with add_server, which returns a regular RconClient bound to the pool. connect_forever
+    polls every server once per ``poll_status_interval``, spreading the polls evenly over the interval. With
+    ``batch`` set the sockets are BatchDatagramTransports, which suits a log socket fed by many busy servers.
+    """
+    def __init__(self, loop, poll_status_interval=6, log_listener_ip=None, log_listener_port=0, local_host='0.0.0.0',
+                 batch=False):
+        self.loop = loop
+        self.batch = batch
+        self.poll_status_interval = poll_status_interval
+        self.log_listener_ip = log_listener_ip
+        self.log_listener_port = log_listener_port
+        self.local_host = local_host
+        self.family = socket.AF_INET6 if ipaddress.ip_address(local_host).version == 6 else socket.AF_INET
+        self.clients = {}
+        self.poll_tasks = {}
+        self.cmd_router = self.log_router = None
+
+    def add_server(self, name, remote_host, remote_port, password=None, secure=RCON_NOSECURE,
+                   client_class=RconClient, **kwargs):
+        if name in self.clients:
+            raise ValueError('Server {} is already in the pool'.format(name))
+        client = client_class(self.loop, remote_host, remote_port, password=password, secure=secure,
+                              poll_status_interval=self.poll_status_interval,
+                              log_listener_ip=self.log_listener_ip, pool=self, **kwargs)
+        self.clients[name] = client
+        return client
+
+    def remove_server(self, name):
+        client = self.clients.pop(name)
+        task = self.poll_tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+        client.close()
+        return client
+
+    async def open(self, log=False):
+        # Routers are registered before binding, so that concurrent callers wait for the same socket
+        if self.cmd_router is None:
+            self.cmd_router = self.bind(0)
+        if log and self.log_router is None:
+            self.log_router = self.bind(self.log_listener_port)
+        await self.cmd_router.ready
+        if log:
+            await self.log_router.ready
+
+    def bind(self, port):
+        router = RconRouterProtocol(self.loop)
+
+        async def __bind():
+            try:
+                if self.batch:
+                    await create_batch_datagram_endpoint(self.loop, lambda: router, local_addr=(self.local_host, port))
+                else:
+                    await self.loop.create_datagram_endpoint(lambda: router, local_addr=(self.local_host, port))
+            except OSError as e:
+                if self.cmd_router is router:
+                    self.cmd_router = None
+                if self.log_router is router:
+                    self.log_router = None
+                router.ready.set_exception(e)
+
+        self.loop.create_task(__bind())
+        return router
+
+    async def attach(self, client, callback, log=False, batch_callback=None):
+        await self.open(log)
+        router = self.log_router if log else self.cmd_router
+        protocol = RconProtocol(client.password, client.secure, callback, remote_addr=client.remote_addr,
+                                signer=client.signer, batch_callback=batch_callback)
+        protocol.connection_made(router.transport)
+        for addr in client.remote_addrs:
+            router.routes[addr] = protocol
+        return router.transport, protocol
+
+    def client_routes(self, client):
+        for router, protocol in ((self.cmd_router, client.cmd_protocol), (self.log_router, client.log_protocol)):
+            if router is not None and protocol is not None:
+                yield router, protocol
+
+    def unroute(self, router, protocol):
+        for addr, routed in list(router.routes.items()):
+            if routed is protocol:
+                del router.routes[addr]
+
+    def reroute(self, client):
+        """
+        Routes the datagrams of the client's current remote_addrs to it, after its host resolved differently
+        """
+        for router, protocol in self.client_routes(client):
+            self.unroute(router, protocol)
+            protocol.remote_addr = client.remote_addr
+            for addr in client.remote_addrs:
+                router.routes[addr] = protocol
+
+    def release(self, protocol, log=False):
+        """
+        Stops routing datagrams to a protocol returned by attach, the shared socket stays open
+        """
+        router = self.log_router if log else self.cmd_router
+        if router is not None:
+            self.unroute(router, protocol)
+        protocol.connection_lost(None)
+
+    def poll(self, name, connect_log=False):
+        task = self.poll_tasks.get(name)
+        if task is not None and not task.done():
+            # The previous poll is still waiting for its answer
+            return
+        self.poll_tasks[name] = self.loop.create_task(self.clients[name].poll(connect_log))
+
+    def broadcast(self, command, names=None, concurrency=32, timeout=5):
+        """
+        Runs command on servers ``names`` (all servers by default), at most ``concurrency`` at once, giving each
+        server ``timeout`` seconds to answer. Returns an iterator of awaitables yielding BroadcastResult in the
+        order the servers finish.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def __execute(name):
+            client = self.clients[name]
+            async with semaphore:
+                try:
+                    await client.open()
+                    response = await client.execute(command, timeout=timeout)
+                except RconCommandFailed as e:
+                    return BroadcastResult(name, e.args[1] if len(e.args) > 1 else b'', e)
+                except OSError as e:
+                    return BroadcastResult(name, b'', e)
+                return BroadcastResult(name, response, None)
+
+        return asyncio.as_completed([__execute(name) for name in (self.clients if names is None else names)])
+
+    async def connect_forever(self, connect_log=False):
+        await self.open(connect_log)
+        while True:
+            names = list(self.clients)
+            if not names:
+                await asyncio.sleep(self.poll_status_interval)
+                continue
+            slot = self.poll_status_interval / len(names)
+            for name in names:
+                if name in self.clients:
+                    self.poll(name, connect_log)
+                await asyncio.sleep(slot)
+
+    def metrics_registries(self):
+        """
+        The metrics of every server by name, for metrics.format_prometheus
+        """
+        return dict((name, client.metrics) for name, client in self.clients.items())
+
+    def close(self):
+        for task in self.poll_tasks.values():
+            task.cancel()
+        self.poll_tasks.clear()
+        for client in self.clients.values():
+            client.close()
+        for router in (self.cmd_router, self.log_router):
+            if router is not None and router.transport is not None:
+                router.transport.close()
+        self.cmd_router = self.log_router = None
@@ -0,0 +1,171 @@
+"""
+Unauthenticated server probing (getstatus and ping)
+
+A Prober owns one UDP socket and can have any number of probes in flight on it. ``getstatus`` answers are
+matched to their request by the challenge token the server echoes back in the infostring, ping answers by
+their source address. Probing needs no rcon password and doesn't show up in the server's rcon log.
+"""
+import asyncio
+import itertools
+import os
+import re
+import socket
+import time
+from collections import namedtuple
+
+from .protocol import QUAKE_STATUS_PACKET, STATUS_RESPONSE_HEADER, PING_Q2_PACKET, PONG_Q2_PACKET
+
+__all__ = ['Prober', 'ProbeResult', 'ProbePlayer', 'parse_infostring', 'parse_status_response']
+
+
+# error is None when the server answered, rtt is in seconds
+ProbeResult = namedtuple('ProbeResult', 'name,host,port,rtt,info,players,error')
+# team is None unless the server runs a team game
+ProbePlayer = namedtuple('ProbePlayer', 'frags,ping,team,name')
+
+PLAYER_REGEX = re.compile(rb'^(-?\d+) (-?\d+)(?: (-?\d+))? "(.*)"$')
+
+
+def parse_infostring(data):
+    """
+    Parses ``\\key\\value\\key\\value...`` into a dict
+    """
+    parts = data.decode('utf8', 'replace').split('\\')
+    return dict(zip(parts[1::2], parts[2::2]))
+
+
+def parse_status_response(packet):
+    """
+    Returns the infostring dict and the list of ProbePlayer of a statusResponse packet
+    """
+    lines = packet[len(STATUS_RESPONSE_HEADER):].split(b'\n')
+    players = []
+    for line in lines[1:]:
+        m = PLAYER_REGEX.match(line)
+        if m is not None:
+            team = m.group(3)
+            players.append(ProbePlayer(int(m.group(1)), int(m.group(2)), None if team is None else int(team),
+                                       m.group(4).decode('utf8', 'replace')))
+    return parse_infostring(lines[0]), players
+
+
+class ProbeProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        # challenge -> future of (receive time, packet)
+        self.status_waiters = {}
+        # (ip, port) -> futures of the receive time, in the order the pings were sent
+        self.ping_waiters = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        received = time.perf_counter()
+        if data.startswith(STATUS_RESPONSE_HEADER):
+            info = parse_infostring(data[len(STATUS_RESPONSE_HEADER):].split(b'\n', 1)[0])
+            future = self.status_waiters.pop(info.get('challenge'), None)
+            if future is not None and not future.done():
+                future.set_result((received, data))
+        elif data.startswith(PONG_Q2_PACKET):
+            waiters = self.ping_waiters.get(addr[:2])
+            while waiters:
+                future = waiters.pop(0)
+                if not future.done():
+                    future.set_result(received)
+                    break
+
+    def error_received(self, exc):
+        pass
+
+
+class Prober:
+    def __init__(self, loop, local_host='0.0.0.0', timeout=1, retries=1):
+        self.loop = loop
+        self.local_host = local_host
+        self.timeout = timeout
+        self.retries = retries
+        self.protocol = None
+        self.token_prefix = os.urandom(3).hex()
+        self.token_counter = itertools.count()
+
+    async def open(self):
+        if self.protocol is None:
+            _, self.protocol = await self.loop.create_datagram_endpoint(ProbeProtocol,
+                                                                        local_addr=(self.local_host, 0))
+
+    async def resolve(self, host, port):
+        infos = await self.loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        return infos[0][4][:2]
+
+    async def request(self, addr, packet, future):
+        """
+        Sends packet until future is done, up to ``retries`` times more, returns the send time of the last attempt
+        """
+        for attempt in range(self.retries + 1):
+            sent = time.perf_counter()
+            self.protocol.transport.sendto(packet, addr)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except asyncio.TimeoutError:
+                continue
+            return sent
+        raise asyncio.TimeoutError()
+
+    async def getstatus(self, host, port, name=None):
+        """
+        Returns a ProbeResult with the server info and players, ``error`` is set if the server didn't answer
+        """
+        await self.open()
+        try:
+            addr = await self.resolve(host, port)
+        except OSError as e:
+            return ProbeResult(name, host, port, None, None, None, e)
+        token = '{}{:x}'.format(self.token_prefix, next(self.token_counter))
+        future = self.loop.create_future()
+        self.protocol.status_waiters[token] = future
+        try:
+            sent = await self.request(addr, QUAKE_STATUS_PACKET + b' ' + token.encode('utf8'), future)
+        except asyncio.TimeoutError as e:
+            return ProbeResult(name, host, port, None, None, None, e)
+        finally:
+            self.protocol.status_waiters.pop(token, None)
+        received, packet = future.result()
+        info, players = parse_status_response(packet)
+        return ProbeResult(name, host, port, received - sent, info, players, None)
+
+    async def ping(self, host, port):
+        """
+        Returns the round trip time in seconds, raises asyncio.TimeoutError if the server didn't answer
+        """
+        await self.open()
+        addr = await self.resolve(host, port)
+        future = self.loop.create_future()
+        waiters = self.protocol.ping_waiters.setdefault(addr, [])
+        waiters.append(future)
+        try:
+            sent = await self.request(addr, PING_Q2_PACKET, future)
+        finally:
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self.protocol.ping_waiters.pop(addr, None)
+        return future.result() - sent
+
+    def sweep(self, servers, concurrency=256):
+        """
+        Probes ``servers``, an iterable of (name, host, port), at most ``concurrency`` at once. Returns an iterator
+        of awaitables yielding ProbeResult in the order the servers answer.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def __probe(name, host, port):
+            async with semaphore:
+                return await self.getstatus(host, port, name=name)
+
+        return asyncio.as_completed([__probe(*server) for server in servers])
+
+    def close(self):
+        if self.protocol is not None and self.protocol.transport is not None:
+            self.protocol.transport.close()
+        self.protocol = None
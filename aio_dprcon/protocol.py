@@ -1,4 +1,6 @@
 import asyncio
+import collections
+import functools
 import hashlib
 import hmac
 
@@ -6,6 +8,8 @@ import time
 
 QUAKE_PACKET_HEADER = b'\xFF' * 4
 RCON_RESPONSE_HEADER = QUAKE_PACKET_HEADER + b'n'
+RCON_RESPONSE_HEADER_SIZE = len(RCON_RESPONSE_HEADER)
+RCON_RESPONSE_TYPE = RCON_RESPONSE_HEADER[4]
 CHALLENGE_PACKET = QUAKE_PACKET_HEADER + b'getchallenge'
 CHALLENGE_RESPONSE_HEADER = QUAKE_PACKET_HEADER + b'challenge '
 MASTER_RESPONSE_HEADER = QUAKE_PACKET_HEADER + b'getserversResponse'
@@ -20,6 +24,11 @@ RCON_NOSECURE = 0
 RCON_SECURE_TIME = 1
 RCON_SECURE_CHALLENGE = 2
 
+# Resend getchallenge if the server hasn't answered in this many seconds
+CHALLENGE_TIMEOUT = 1
+# Do not use a prefetched challenge older than this, the server may have already expired it
+CHALLENGE_TTL = 10
+
 
 def ensure_bytes(something):
     if not isinstance(something, bytes):
@@ -27,29 +36,87 @@ def ensure_bytes(something):
     return something
 
 
-def md4(*args, **kwargs):
-    return hashlib.new('MD4', *args, **kwargs)
+def hashlib_md4(data=b''):
+    return hashlib.new('MD4', data)
+
+
+def get_md4_constructor():
+    try:
+        hashlib_md4()
+    except ValueError:
+        from .md4 import MD4
+        return MD4
+    else:
+        return hashlib_md4
+
+
+md4_constructor = None
+
+
+def md4(data=b''):
+    global md4_constructor
+    if md4_constructor is None:
+        md4_constructor = get_md4_constructor()
+    return md4_constructor(data)
 
 
 def hmac_md4(key, msg):
     return hmac.new(key, msg, md4)
 
 
+TRANS_36 = bytes((x ^ 0x36) for x in range(256))
+TRANS_5C = bytes((x ^ 0x5C) for x in range(256))
+
+
+class RconSigner:
+    """
+    Signs secure rcon packets with HMAC-MD4 keyed by the rcon password.
+
+    The MD4 states after absorbing the inner and outer padded keys are computed once, signing a packet only
+    copies them and hashes the message.
+    """
+    def __init__(self, password):
+        key = ensure_bytes(password)
+        if len(key) > 64:
+            key = md4(key).digest()
+        key = key.ljust(64, b'\0')
+        self.inner = md4(key.translate(TRANS_36))
+        self.outer = md4(key.translate(TRANS_5C))
+
+    def sign(self, msg):
+        inner = self.inner.copy()
+        inner.update(msg)
+        outer = self.outer.copy()
+        outer.update(inner.digest())
+        return outer.digest()
+
+    def time_packet(self, command):
+        msg = ensure_bytes('{time:6f} {command}'.format(time=time.time(), command=command))
+        return b''.join([
+            QUAKE_PACKET_HEADER,
+            b'srcon HMAC-MD4 TIME ',
+            self.sign(msg),
+            b' ',
+            msg
+        ])
+
+    def challenge_packet(self, challenge, command):
+        msg = b' '.join([ensure_bytes(challenge), ensure_bytes(command)])
+        return b''.join([
+            QUAKE_PACKET_HEADER,
+            b'srcon HMAC-MD4 CHALLENGE ',
+            self.sign(msg),
+            b' ',
+            msg
+        ])
+
+
 def rcon_nosecure_packet(password, command):
     return QUAKE_PACKET_HEADER + ensure_bytes('rcon {password} {command}'.format(password=password, command=command))
 
 
 def rcon_secure_time_packet(password, command):
-    password = ensure_bytes(password)
-    cur_time = time.time()
-    key = hmac_md4(password, ensure_bytes("{time:6f} {command}"
-                                          .format(time=cur_time, command=command))).digest()
-    return b''.join([
-        QUAKE_PACKET_HEADER,
-        b'srcon HMAC-MD4 TIME ',
-        key,
-        ensure_bytes(' {time:6f} {command}'.format(time=cur_time, command=command))
-    ])
+    return RconSigner(password).time_packet(command)
 
 
 def parse_challenge_response(response):
@@ -58,61 +125,154 @@ def parse_challenge_response(response):
 
 
 def rcon_secure_challenge_packet(password, challenge, command):
-    password = ensure_bytes(password)
-    challenge = ensure_bytes(challenge)
-    command = ensure_bytes(command)
-    hmac_key = b' '.join([challenge, command])
-    key = hmac_md4(password, hmac_key).digest()
-    return b''.join([
-        QUAKE_PACKET_HEADER,
-        b'srcon HMAC-MD4 CHALLENGE ',
-        key,
-        b' ',
-        challenge,
-        b' ',
-        command
-    ])
+    return RconSigner(password).challenge_packet(challenge, command)
 
 
 def parse_rcon_response(packet):
-    return packet[len(RCON_RESPONSE_HEADER):]
+    return packet[RCON_RESPONSE_HEADER_SIZE:]
+
+
+class RconProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol of a single rcon server.
+
+    With ``remote_addr`` set the protocol can share a transport with other servers (see RconPool). The way
+    packets are built and sent is chosen once from ``secure`` when the protocol is created.
+
+    ``batch_callback``, if given, receives the responses of a whole batch of datagrams as a list of
+    ``(data, addr)`` when the protocol runs on a BatchDatagramTransport.
+    """
+    __slots__ = ('password', 'secure', 'received_callback', 'connection_made_callback', 'remote_addr',
+                 'signer', 'batch_callback', 'build_packet', 'send_command', 'challenge', 'challenge_timestamp',
+                 'challenge_requested', 'challenge_timer', 'challenge_queue', 'transport', 'loop', 'local_host',
+                 'local_port')
+
+    def __init__(self, password, secure, received_callback=None, connection_made_callback=None, remote_addr=None,
+                 signer=None, batch_callback=None):
+        self.password = password
+        self.secure = secure
+        self.received_callback = received_callback
+        self.connection_made_callback = connection_made_callback
+        self.remote_addr = remote_addr
+        if signer is None and secure != RCON_NOSECURE:
+            signer = RconSigner(password)
+        self.signer = signer
+        self.batch_callback = batch_callback
+        if secure == RCON_SECURE_CHALLENGE:
+            self.build_packet = None
+            self.send_command = self.send_challenge_mode
+        else:
+            if secure == RCON_SECURE_TIME:
+                self.build_packet = signer.time_packet
+            else:
+                self.build_packet = functools.partial(rcon_nosecure_packet, password)
+            self.send_command = self.send_packet
+        self.challenge = None
+        self.challenge_timestamp = 0
+        self.challenge_requested = False
+        self.challenge_timer = None
+        self.challenge_queue = collections.deque()
+        self.transport = None
+        self.loop = None
+        self.local_host = None
+        self.local_port = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_event_loop()
+        _, self.local_port = self.transport.get_extra_info('sockname')
+        if self.connection_made_callback:
+            self.connection_made_callback(self)
+        if self.secure == RCON_SECURE_CHALLENGE:
+            self.request_challenge()
+
+    def connection_lost(self, exc):
+        if self.challenge_timer:
+            self.challenge_timer.cancel()
+            self.challenge_timer = None
+
+    def datagram_received(self, data, addr):
+        # Rcon responses come first and are told apart by their type byte alone, the packet header is only
+        # checked on the rare other packets
+        if len(data) > 4 and data[4] == RCON_RESPONSE_TYPE:
+            if self.received_callback:
+                self.received_callback(data[RCON_RESPONSE_HEADER_SIZE:], addr)
+        elif data.startswith(CHALLENGE_RESPONSE_HEADER):
+            self.challenge_received(parse_challenge_response(data))
+
+    def datagrams_received(self, datagrams):
+        if self.batch_callback is None:
+            for data, addr in datagrams:
+                self.datagram_received(data, addr)
+            return
+        responses = []
+        append = responses.append
+        for data, addr in datagrams:
+            if len(data) > 4 and data[4] == RCON_RESPONSE_TYPE:
+                append((data[RCON_RESPONSE_HEADER_SIZE:], addr))
+            elif data.startswith(CHALLENGE_RESPONSE_HEADER):
+                self.challenge_received(parse_challenge_response(data))
+        if responses:
+            self.batch_callback(responses)
+
+    def error_received(self, exc):
+        pass
+
+    def request_challenge(self):
+        # DarkPlaces keeps a single challenge per client address and invalidates it once it is used, so
+        # there's no point in having more than one getchallenge in flight: pending commands share it
+        if self.challenge_requested:
+            return
+        self.challenge_requested = True
+        self.transport.sendto(CHALLENGE_PACKET, self.remote_addr)
+        self.challenge_timer = self.loop.call_later(CHALLENGE_TIMEOUT, self.challenge_timed_out)
+
+    def challenge_timed_out(self):
+        self.challenge_timer = None
+        self.challenge_requested = False
+        if self.challenge_queue:
+            self.request_challenge()
+
+    def challenge_received(self, challenge):
+        if self.challenge_timer:
+            self.challenge_timer.cancel()
+            self.challenge_timer = None
+        self.challenge_requested = False
+        if self.challenge_queue:
+            self.send_with_challenge(challenge, self.challenge_queue.popleft())
+        else:
+            self.challenge = challenge
+            self.challenge_timestamp = time.time()
+
+    def send_with_challenge(self, challenge, command):
+        self.transport.sendto(self.signer.challenge_packet(challenge, command), self.remote_addr)
+        # The challenge is spent now, prefetch the next one so that the following command doesn't wait
+        self.request_challenge()
+
+    def send_challenge_mode(self, command):
+        challenge, self.challenge = self.challenge, None
+        if challenge is not None and not self.challenge_queue and \
+                time.time() - self.challenge_timestamp < CHALLENGE_TTL:
+            self.send_with_challenge(challenge, command)
+        else:
+            self.challenge_queue.append(command)
+            self.request_challenge()
+
+    def send_packet(self, command):
+        self.transport.sendto(self.build_packet(command), self.remote_addr)
+
+    def send(self, command):
+        self.send_command(command)
 
 
 def create_rcon_protocol(password, secure,
                          received_callback=None,
-                         connection_made_callback=None):
-    class RconProtocol(asyncio.DatagramProtocol):
-        def __init__(self):
-            self.challenge = None
-            self.transport = None
-            self.local_host = None
-            self.local_port = None
-
-        def connection_made(self, transport):
-            self.transport = transport
-            _, self.local_port = self.transport.get_extra_info('sockname')
-            if connection_made_callback:
-                connection_made_callback(self)
-
-        def datagram_received(self, data, addr):
-            if data.startswith(CHALLENGE_RESPONSE_HEADER):
-                self.challenge = parse_challenge_response(data)
-            if data.startswith(RCON_RESPONSE_HEADER):
-                decoded = parse_rcon_response(data)
-                if received_callback:
-                    received_callback(decoded, addr)
-
-        def error_received(self, exc):
-            pass
-
-        def send(self, command):
-            msg = None
-            if secure == RCON_SECURE_CHALLENGE:
-                raise NotImplementedError()
-            elif secure == RCON_SECURE_TIME:
-                msg = rcon_secure_time_packet(password, command)
-            elif secure == RCON_NOSECURE:
-                msg = rcon_nosecure_packet(password, command)
-            self.transport.sendto(msg)
-
-    return RconProtocol
+                         connection_made_callback=None,
+                         remote_addr=None,
+                         signer=None,
+                         batch_callback=None):
+    """
+    Returns a protocol factory for loop.create_datagram_endpoint
+    """
+    return functools.partial(RconProtocol, password, secure, received_callback, connection_made_callback,
+                             remote_addr, signer, batch_callback)
@@ -0,0 +1,118 @@
+"""
+Outbound rate limiting
+
+DarkPlaces drops rcon packets from addresses that send too fast, so every RconClient sends through a SendQueue
+limited by a TokenBucket (one token per packet). Packets go out immediately while tokens are available; the
+rest wait in one of three priority lanes (HIGH for status polls, NORMAL, BULK for completion scans) and are
+sent, highest lane first, as the bucket refills.
+"""
+import collections
+import time
+
+__all__ = ['TokenBucket', 'SendQueue', 'HIGH', 'NORMAL', 'BULK', 'DEFAULT_RATE', 'DEFAULT_BURST']
+
+HIGH = 0
+NORMAL = 1
+BULK = 2
+
+# Packets per second and the number of packets that may be sent at once
+DEFAULT_RATE = 50
+DEFAULT_BURST = 20
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def take(self, count=1):
+        """
+        Takes ``count`` tokens and returns 0, or returns the seconds until they are available without taking any
+        """
+        # A group larger than the bucket is let through once the bucket is full
+        count = min(count, self.burst)
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= count:
+            self.tokens -= count
+            return 0
+        return (count - self.tokens) / self.rate
+
+
+class SendQueue:
+    """
+    Sends groups of commands through ``send``, a group (e.g. a command and its response marker) is never
+    split or reordered. A group queued with ``coalesce`` is dropped if an identical one is still waiting.
+    While paused (e.g. there is no channel to send through) groups wait in their lanes until resume().
+    """
+    def __init__(self, loop, send, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.loop = loop
+        self.send = send
+        self.bucket = TokenBucket(rate, burst)
+        self.lanes = [collections.deque() for _ in (HIGH, NORMAL, BULK)]
+        self.waiting = set()
+        self.timer = None
+        self.paused = False
+        self.coalesced = 0
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes)
+
+    def put(self, commands, priority=NORMAL, coalesce=False):
+        """
+        Returns False if the commands were coalesced with identical waiting ones
+        """
+        commands = tuple(commands)
+        if coalesce and commands in self.waiting:
+            self.coalesced += 1
+            return False
+        if self.timer is None and not self.paused and not any(self.lanes) and not self.bucket.take(len(commands)):
+            for command in commands:
+                self.send(command)
+            return True
+        if coalesce:
+            self.waiting.add(commands)
+        self.lanes[priority].append((commands, coalesce))
+        if self.timer is None:
+            self.drain()
+        return True
+
+    def pause(self):
+        self.paused = True
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def resume(self):
+        self.paused = False
+        if self.timer is None:
+            self.drain()
+
+    def drain(self):
+        self.timer = None
+        if self.paused:
+            return
+        for lane in self.lanes:
+            while lane:
+                commands, coalesce = lane[0]
+                delay = self.bucket.take(len(commands))
+                if delay:
+                    self.timer = self.loop.call_later(delay, self.drain)
+                    return
+                lane.popleft()
+                if coalesce:
+                    self.waiting.discard(commands)
+                for command in commands:
+                    self.send(command)
+
+    def clear(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        for lane in self.lanes:
+            lane.clear()
+        self.waiting.clear()
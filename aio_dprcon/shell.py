@@ -1,3 +1,4 @@
+import asyncio
 import os
 import cmd
 import signal
@@ -8,19 +9,39 @@ import click
 import dpcolors
 import readline
 
+from .client import RESPONSE_MARKER_REGEX
+from .exceptions import RconCommandTimeout
 
 # TODO: connection activity indicator (if possible)
 
 
 class RconShell(cmd.Cmd):
+    """
+    Interactive rcon console.
+
+    The shell runs on the client's event loop: input is read by readline in an executor thread, so status
+    polling and everything else on the loop keep running while the user types. Server output of a command is
+    printed line by line as it arrives. Polls and commands take turns (command_lock), the command channel
+    doesn't tell their output apart. Players joining or leaving and map changes seen by the polls are printed
+    above the prompt being edited.
+    """
+    command_timeout = 5
+
     def __init__(self, server, rcon_client, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.client = rcon_client
         self.loop = self.client.loop
         self.completion_matches = []
-        self.data = b''
         self.server = server
-        signal.signal(signal.SIGINT, self.abort)
+        self.running = False
+        self.reading = False
+        self.command_task = None
+        self.command_lock = asyncio.Lock()
+        # Set while a command holds command_lock, only then the command channel output is printed
+        self.streaming = False
+        self.output_buffer = bytearray()
+        # Command channel output is printed while a command runs, see output_received
+        self.client.custom_cmd_callback = self.output_received
         self.history_file = os.path.expanduser('~/.config/aio_dprcon/history.{}'.format(self.server.name))
         self.init_history()
 
@@ -33,27 +54,100 @@ class RconShell(cmd.Cmd):
         readline.set_history_length(2048)
         readline.write_history_file(self.history_file)
 
-    def data_cb(self, data, addr):
-        self.data += data
+    def cmdloop(self, intro=None):
+        readline.set_completer(self.complete)
+        readline.parse_and_bind(self.completekey + ': complete')
+        self.loop.add_signal_handler(signal.SIGINT, self.abort)
+        try:
+            self.loop.run_until_complete(self.run())
+        finally:
+            self.loop.remove_signal_handler(signal.SIGINT)
+
+    async def run(self):
+        await self.preloop()
+        poll_task = self.loop.create_task(self.poll_forever())
+        changes_task = self.loop.create_task(self.print_status_changes())
+        self.running = True
+        try:
+            while self.running:
+                line = await self.read_line()
+                await self.execute_line(self.precmd(line))
+        finally:
+            poll_task.cancel()
+            changes_task.cancel()
 
-    def preloop(self):
-        self.loop.run_until_complete(self.client.connect_once())
+    async def preloop(self):
+        await self.client.connect_once()
         if not self.client.connected:
             click.secho('Could not connect to server.', fg='red')
             sys.exit(1)
         self.prompt = '{} > '.format(click.style(self.client.status['host'],
                                                  fg='green',
                                                  bold=True))
-        self.client.custom_cmd_callback = self.data_cb
 
-    def abort(self, signal, frame):
-        self.onecmd('')
+    async def poll_forever(self):
+        # Like RconClient.connect_forever, the first poll is due one interval after preloop connected
+        while True:
+            await asyncio.sleep(self.client.poll_status_interval)
+            await self.poll()
+
+    async def poll(self):
+        async with self.command_lock:
+            await self.client.poll()
+
+    async def print_status_changes(self):
+        with self.client.events('player_joined', 'player_left', 'map_changed') as changes:
+            async for change in changes:
+                self.write(self.format_status_change(change) + '\n')
+
+    def format_status_change(self, change):
+        if change.kind == 'map_changed':
+            return click.style('Map changed to {}'.format(change.new), fg='blue', bold=True)
+        name = dpcolors.ColorString.from_dp(change.player.name).to_ansi_8bit().decode('utf8')
+        return '{} {}'.format(name, click.style('joined' if change.kind == 'player_joined' else 'left',
+                                                fg='blue', bold=True))
+
+    async def read_line(self):
+        self.reading = True
+        try:
+            return await self.loop.run_in_executor(None, input, self.prompt)
+        except EOFError:
+            return 'EOF'
+        finally:
+            self.reading = False
+
+    def write(self, text):
+        """
+        Prints text, keeping the prompt and the line being typed below it
+        """
+        if self.reading:
+            sys.stdout.write('\r\x1b[K' + text + self.prompt + readline.get_line_buffer())
+        else:
+            sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def output_received(self, data, addr):
+        if not self.streaming:
+            return
+        buf = self.output_buffer
+        buf += data
+        end = buf.rfind(b'\n') + 1
+        if not end:
+            return
+        lines = RESPONSE_MARKER_REGEX.sub(b'', bytes(buf[:end]))
+        del buf[:end]
+        if lines:
+            self.write(dpcolors.ColorString.from_dp(lines).to_ansi_8bit().decode('utf8'))
+
+    def abort(self):
+        if self.command_task is not None:
+            self.command_task.cancel()
 
     def do_exit(self, line):
         if line == 'EOF':
             print()
         click.secho('Good Riddance!', fg='blue', bold=True)
-        sys.exit(0)
+        self.running = False
 
     def do_refresh(self, line):
         pass
@@ -61,6 +155,7 @@ class RconShell(cmd.Cmd):
     def run_special(self, line):
         if line in ('EOF', 'exit', 'quit'):
             self.do_exit(line)
+            return True
         if line.startswith('%'):
             func = getattr(self, 'do_' + line[1:], None)
             if func:
@@ -69,14 +164,32 @@ class RconShell(cmd.Cmd):
                 click.secho('No such special function: {}'.format(line))
             return True
 
+    async def execute_line(self, line):
+        if not line or self.run_special(line):
+            return
+        self.command_task = self.loop.create_task(self.run_command(line))
+        try:
+            await self.command_task
+        except RconCommandTimeout:
+            click.secho('Command timed out, the output may be incomplete', fg='yellow')
+        except asyncio.CancelledError:
+            click.secho('Command aborted', fg='yellow')
+        finally:
+            self.command_task = None
+            if self.output_buffer:
+                self.write(dpcolors.ColorString.from_dp(bytes(self.output_buffer)).to_ansi_8bit().decode('utf8'))
+                self.output_buffer.clear()
+
+    async def run_command(self, line):
+        async with self.command_lock:
+            self.streaming = True
+            try:
+                return await self.client.execute(line, timeout=self.command_timeout)
+            finally:
+                self.streaming = False
+
     def onecmd(self, line):
-        if line:
-            if self.run_special(line):
-                return
-            self.loop.run_until_complete(self.client.execute(line, timeout=1))
-            cs = dpcolors.ColorString.from_dp(self.data)
-            click.echo(cs.to_ansi_8bit().decode('utf8'), nl=False)
-            self.data = b''
+        self.loop.run_until_complete(self.execute_line(line))
 
     def complete(self, text, state):
         if state == 0:
@@ -85,11 +198,13 @@ class RconShell(cmd.Cmd):
             stripped = len(origline) - len(line)
             begidx = readline.get_begidx() - stripped
             endidx = readline.get_endidx() - stripped
-            self.completion_matches = []
+            index = self.client.completion_index
             if begidx == 0:
-                for type_ in ('cvar', 'alias', 'command'):
-                    self.completion_matches += [i for i in self.client.completions[type_].keys() if i.startswith(text)]
-                self.completion_matches.sort()
+                self.completion_matches = index.complete(text)
+            elif len(line[:begidx].split()) == 1:
+                self.completion_matches = index.complete_value(line.split(None, 1)[0], text)
+            else:
+                self.completion_matches = []
         try:
             return self.completion_matches[state]
         except IndexError:
@@ -0,0 +1,158 @@
+"""
+Non-blocking sinks for the raw log stream
+
+Writes never block the event loop: data is collected in a bounded in-memory buffer and written out in batches
+by an executor thread, either when ``flush_size`` bytes have accumulated or ``flush_interval`` seconds after the
+first unflushed write. When the output falls behind and the buffer is full the oldest data is discarded and
+counted in ``dropped``.
+"""
+import collections
+import gzip
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['BufferedSink', 'StreamSink', 'RotatingFileSink']
+
+
+class BufferedSink:
+    def __init__(self, loop, max_buffer=1 << 20, flush_size=64 << 10, flush_interval=0.2):
+        self.loop = loop
+        self.max_buffer = max_buffer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.chunks = collections.deque()
+        self.size = 0
+        self.dropped = 0
+        self.flush_timer = None
+        self.writing = False
+        # Data handed to the executor and not written yet
+        self.pending = None
+        # Held around write_out, so that close doesn't write (or close the output) under an executor write
+        self.write_lock = threading.Lock()
+
+    def write(self, data):
+        if len(data) > self.max_buffer:
+            self.dropped += len(data)
+            return
+        while self.size + len(data) > self.max_buffer:
+            chunk = self.chunks.popleft()
+            self.size -= len(chunk)
+            self.dropped += len(chunk)
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        if self.size >= self.flush_size:
+            self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = self.loop.call_later(self.flush_interval, self.flush)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+    def flush(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if self.writing or not self.chunks:
+            # Whatever is written meanwhile goes out once the current write completes
+            return
+        self.writing = True
+        self.pending = self.take()
+        future = self.loop.run_in_executor(None, self.write_pending)
+        future.add_done_callback(self.write_done)
+
+    def write_pending(self):
+        with self.write_lock:
+            # close may have written it already
+            data, self.pending = self.pending, None
+            if data:
+                self.write_out(data)
+
+    def write_done(self, future):
+        self.writing = False
+        if future.exception() is not None:
+            logger.warning('Could not write the log', exc_info=future.exception())
+        if self.chunks:
+            self.flush()
+
+    def close(self):
+        """
+        Writes out the remaining data synchronously after any write in progress, meant to be called on shutdown
+        """
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        with self.write_lock:
+            data = (self.pending or b'') + self.take()
+            self.pending = None
+            if data:
+                self.write_out(data)
+
+    def write_out(self, data):
+        """
+        Called in an executor thread, one call at a time
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+class StreamSink(BufferedSink):
+    def __init__(self, loop, stream, **kwargs):
+        super().__init__(loop, **kwargs)
+        self.stream = stream
+
+    def write_out(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+
+
+class RotatingFileSink(BufferedSink):
+    """
+    Appends to ``path``; once the file grows over ``max_bytes`` it is renamed to path.1 (path.1.gz if
+    ``compress`` is set), older files are shifted and at most ``backup_count`` of them are kept.
+    """
+    def __init__(self, loop, path, max_bytes=64 << 20, backup_count=5, compress=False, **kwargs):
+        super().__init__(loop, **kwargs)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.file = None
+
+    def backup_path(self, i):
+        return '{}.{}{}'.format(self.path, i, '.gz' if self.compress else '')
+
+    def write_out(self, data):
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+        self.file.write(data)
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        self.file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self.backup_path(i)):
+                os.replace(self.backup_path(i), self.backup_path(i + 1))
+        if self.backup_count < 1:
+            os.remove(self.path)
+        elif self.compress:
+            with open(self.path, 'rb') as src, gzip.open(self.backup_path(1), 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.backup_path(1))
+
+    def close(self):
+        super().close()
+        with self.write_lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
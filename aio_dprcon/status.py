@@ -0,0 +1,134 @@
+"""
+Server status model (``status 1``)
+
+ServerStatus holds the header fields of the last ``status 1`` answer (host, version, protocol, map, timing,
+players) and its player table keyed by slot. It is updated in place by the command channel parsers, and every
+completed answer is compared to the previous one, producing change events:
+
+    PlayerJoined(player), PlayerLeft(player), MapChanged(old, new), FragsChanged(player, old)
+
+The first answer (after connecting, or after reset) only sets the map, it isn't reported as a MapChanged.
+
+All change classes have a ``kind`` attribute like eventlog events, so they can be received from
+RconClient.events() as well.
+"""
+from collections import namedtuple
+from collections.abc import Mapping
+
+__all__ = ['ServerStatus', 'PlayerStatus', 'PlayerJoined', 'PlayerLeft', 'MapChanged',
+           'FragsChanged', 'parse_player_time']
+
+
+# time is the number of seconds since the player connected
+class PlayerStatus(namedtuple('PlayerStatus', 'slot,ip,packet_loss,ping,time,frags,name')):
+    __slots__ = ()
+
+    def is_same_player(self, other):
+        # A slot taken over by someone else shows a different address or a shorter connection time
+        return self.ip == other.ip and self.time >= other.time
+
+
+class PlayerJoined(namedtuple('PlayerJoined', 'player')):
+    __slots__ = ()
+    kind = 'player_joined'
+
+
+class PlayerLeft(namedtuple('PlayerLeft', 'player')):
+    __slots__ = ()
+    kind = 'player_left'
+
+
+class MapChanged(namedtuple('MapChanged', 'old,new')):
+    __slots__ = ()
+    kind = 'map_changed'
+
+
+class FragsChanged(namedtuple('FragsChanged', 'player,old')):
+    __slots__ = ()
+    kind = 'frags_changed'
+
+
+def parse_player_time(value):
+    seconds = 0
+    for part in value.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+class ServerStatus(Mapping):
+    """
+    Mapping of the status fields, plus ``players``: {slot: PlayerStatus}. Fields are set by the command
+    channel parsers through ``status[key] = value``.
+
+    The player table of an answer is collected aside and committed once the number of rows announced by the
+    ``players:`` line has arrived, so ``players`` never holds a partially received table.
+    """
+    def __init__(self):
+        self.fields = {}
+        self.players = {}
+        self.committed_map = None
+        self.expected_players = None
+        self.pending_players = None
+
+    def __getitem__(self, key):
+        return self.fields[key]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __bool__(self):
+        return bool(self.fields)
+
+    def __setitem__(self, key, value):
+        self.fields[key] = value
+        if key == 'players':
+            # "2 active (16 max)"
+            self.expected_players = int(value.split(' ', 1)[0])
+
+    def reset(self):
+        self.fields.clear()
+        self.players.clear()
+        self.committed_map = None
+        self.expected_players = None
+        self.pending_players = None
+
+    def start_players(self):
+        self.pending_players = {}
+
+    def add_player(self, player):
+        if self.pending_players is not None:
+            self.pending_players[player.slot] = player
+
+    @property
+    def complete(self):
+        return self.pending_players is not None and self.expected_players is not None and \
+            len(self.pending_players) >= self.expected_players
+
+    def commit(self):
+        """
+        Replaces the player table with the collected one, returns the list of changes
+        """
+        changes = []
+        new_map = self.fields.get('map')
+        if new_map != self.committed_map:
+            if self.committed_map is not None:
+                changes.append(MapChanged(self.committed_map, new_map))
+            self.committed_map = new_map
+        players = self.players
+        pending = self.pending_players or {}
+        for slot in [slot for slot, player in players.items()
+                     if slot not in pending or not pending[slot].is_same_player(player)]:
+            changes.append(PlayerLeft(players.pop(slot)))
+        for slot, player in pending.items():
+            old = players.get(slot)
+            if old is None:
+                changes.append(PlayerJoined(player))
+            elif old.frags != player.frags:
+                changes.append(FragsChanged(player, old.frags))
+            players[slot] = player
+        self.pending_players = None
+        self.expected_players = None
+        return changes
@@ -0,0 +1,266 @@
+"""
+A fake DarkPlaces server for tests and benchmarks
+
+FakeDarkplacesServer answers on a local UDP port like a Xonotic server would:
+
+- ``rcon`` and ``srcon`` HMAC-MD4 in TIME and CHALLENGE modes (``secure`` works like the rcon_secure cvar:
+  0 accepts everything, 1 only srcon, 2 only challenge based srcon), ``getchallenge``
+- the rcon commands ``status 1``, ``echo``, ``cvarlist``, ``cmdlist``, ``alias``, cvar queries and
+  assignments, ``sv_cmd addtolist/removefromlist log_dest_udp``
+- ``getstatus`` and ``ping``
+- an eventlog emitter replaying lines to every ``log_dest_udp`` destination at a given rate
+
+Every accepted rcon command is recorded in ``commands``.
+"""
+import asyncio
+import hmac
+import itertools
+import os
+import random
+import string
+import time
+
+from .protocol import QUAKE_PACKET_HEADER, RCON_RESPONSE_HEADER, CHALLENGE_PACKET, CHALLENGE_RESPONSE_HEADER, \
+    QUAKE_STATUS_PACKET, STATUS_RESPONSE_HEADER, PING_Q2_PACKET, PONG_Q2_PACKET, RCON_NOSECURE, \
+    RCON_SECURE_CHALLENGE, ensure_bytes, md4
+
+__all__ = ['FakeDarkplacesServer', 'FakePlayer', 'EVENTLOG_SAMPLE']
+
+# DarkPlaces splits rcon output into packets of about this size
+MAX_RESPONSE_SIZE = 1400
+# rcon_secure_maxdiff, the allowed clock difference of srcon TIME packets
+MAX_TIME_DIFF = 5
+HMAC_SIZE = 16
+
+# Shipped as package data, see setup.py
+EVENTLOG_SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'eventlog.log')
+
+DEFAULT_CVARS = {
+    'hostname': 'Fake Xonotic Server',
+    'sv_adminnick': '',
+    'g_maplist': 'dance stormkeep',
+    'log_dest_udp': '',
+    'sv_gravity': '800',
+    'sv_maxclients': '16',
+    'g_balance_health_start': '100',
+}
+
+
+class FakePlayer:
+    def __init__(self, slot, name, ip='botclient', frags=0, ping=0, connected=None):
+        self.slot = slot
+        self.name = name
+        self.ip = ip
+        self.frags = frags
+        self.ping = ping
+        self.connected = time.time() if connected is None else connected
+
+
+class FakeDarkplacesServer(asyncio.DatagramProtocol):
+    def __init__(self, password='secret', secure=RCON_NOSECURE, map_name='dance', cvars=None, players=()):
+        self.password = ensure_bytes(password)
+        self.secure = secure
+        self.map_name = map_name
+        self.cvars = dict(DEFAULT_CVARS)
+        if cvars:
+            self.cvars.update(cvars)
+        self.players = dict((player.slot, player) for player in players)
+        self.commands = []
+        self.rejected = 0
+        self.challenges = {}
+        self.transport = None
+        self.eventlog_task = None
+
+    async def start(self, loop, host='127.0.0.1', port=0):
+        await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        return self
+
+    @property
+    def address(self):
+        return self.transport.get_extra_info('sockname')[:2]
+
+    def close(self):
+        if self.eventlog_task is not None:
+            self.eventlog_task.cancel()
+            self.eventlog_task = None
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def error_received(self, exc):
+        pass
+
+    def datagram_received(self, data, addr):
+        if data.startswith(QUAKE_PACKET_HEADER + b'rcon '):
+            command = self.check_rcon(data[len(QUAKE_PACKET_HEADER + b'rcon '):])
+        elif data.startswith(QUAKE_PACKET_HEADER + b'srcon HMAC-MD4 TIME '):
+            command = self.check_srcon_time(data[len(QUAKE_PACKET_HEADER + b'srcon HMAC-MD4 TIME '):])
+        elif data.startswith(QUAKE_PACKET_HEADER + b'srcon HMAC-MD4 CHALLENGE '):
+            command = self.check_srcon_challenge(data[len(QUAKE_PACKET_HEADER + b'srcon HMAC-MD4 CHALLENGE '):],
+                                                 addr)
+        elif data.startswith(CHALLENGE_PACKET):
+            challenge = ''.join(random.choice(string.ascii_letters + string.digits) for _ in range(11)).encode()
+            self.challenges[addr] = challenge
+            self.transport.sendto(CHALLENGE_RESPONSE_HEADER + challenge + b'\0', addr)
+            return
+        elif data.startswith(QUAKE_STATUS_PACKET):
+            self.transport.sendto(self.status_response(data[len(QUAKE_STATUS_PACKET) + 1:]), addr)
+            return
+        elif data.startswith(PING_Q2_PACKET):
+            self.transport.sendto(PONG_Q2_PACKET, addr)
+            return
+        else:
+            return
+        if command is None:
+            self.rejected += 1
+            return
+        self.commands.append(command.decode('utf8', 'replace'))
+        self.respond(self.execute(command), addr)
+
+    def check_rcon(self, packet):
+        if self.secure != RCON_NOSECURE:
+            return None
+        password, _, command = packet.partition(b' ')
+        return command if password == self.password else None
+
+    def check_signature(self, packet):
+        digest, msg = packet[:HMAC_SIZE], packet[HMAC_SIZE + 1:]
+        expected = hmac.new(self.password, msg, md4).digest()
+        return msg if hmac.compare_digest(digest, expected) else None
+
+    def check_srcon_time(self, packet):
+        if self.secure == RCON_SECURE_CHALLENGE:
+            return None
+        msg = self.check_signature(packet)
+        if msg is None:
+            return None
+        sent_time, _, command = msg.partition(b' ')
+        if abs(float(sent_time) - time.time()) > MAX_TIME_DIFF:
+            return None
+        return command
+
+    def check_srcon_challenge(self, packet, addr):
+        msg = self.check_signature(packet)
+        if msg is None:
+            return None
+        challenge, _, command = msg.partition(b' ')
+        # Challenges are single use
+        if self.challenges.pop(addr, None) != challenge:
+            return None
+        return command
+
+    def respond(self, output, addr):
+        for i in range(0, len(output), MAX_RESPONSE_SIZE):
+            self.transport.sendto(RCON_RESPONSE_HEADER + output[i:i + MAX_RESPONSE_SIZE], addr)
+
+    def execute(self, command):
+        """
+        Returns the console output of an rcon command
+        """
+        name, _, args = command.decode('utf8', 'replace').partition(' ')
+        handler = getattr(self, 'cmd_' + name, None)
+        if handler is not None:
+            return handler(args).encode('utf8')
+        if name in self.cvars:
+            if args:
+                self.cvars[name] = args.strip('"')
+                return b''
+            return '"{0}" is "{1}" ["{1}"]\n'.format(name, self.cvars[name]).encode('utf8')
+        return 'Unknown command "{}"\n'.format(name).encode('utf8')
+
+    def cmd_echo(self, args):
+        return args + '\n'
+
+    def cmd_status(self, args):
+        lines = ['host:     {}'.format(self.cvars['hostname']),
+                 'version:  Xonotic build 00:00:00 Jan  1 2017 - release (gamename Xonotic)',
+                 'protocol: 3504 (DP7)',
+                 'map:      {}'.format(self.map_name),
+                 'timing:   1.0% CPU, 0.00% lost, offset avg 0.1ms, max 1.0ms, sdev 0.1ms',
+                 'players:  {} active ({} max)'.format(len(self.players), self.cvars['sv_maxclients']),
+                 '',
+                 '^2IP                                             %pl ping  time   frags  no   name']
+        now = time.time()
+        for i, player in enumerate(sorted(self.players.values(), key=lambda p: p.slot)):
+            seconds = int(now - player.connected)
+            lines.append('{}{:<47} {:2d} {:4d} {:2d}:{:02d}:{:02d} {:4d}  #{:<3d} ^7{}'.format(
+                '^3' if i % 2 else '^7', player.ip, 0, player.ping, seconds // 3600, seconds // 60 % 60,
+                seconds % 60, player.frags, player.slot, player.name))
+        return '\n'.join(lines) + '\n'
+
+    def cmd_cvarlist(self, prefix):
+        names = sorted(i for i in self.cvars if i.startswith(prefix))
+        lines = ['{0} is "{1}" ["{1}"]'.format(name, self.cvars[name]) for name in names]
+        if prefix:
+            lines.append('{} cvar(s) beginning with "{}"'.format(len(names), prefix))
+        else:
+            lines.append('{} cvar(s)'.format(len(names)))
+        return '\n'.join(lines) + '\n'
+
+    def cmd_cmdlist(self, prefix):
+        names = sorted(i[len('cmd_'):] for i in dir(self) if i.startswith('cmd_' + prefix))
+        return ''.join('{} : fake command\n'.format(name) for name in names) + '{} commands\n'.format(len(names))
+
+    def cmd_alias(self, args):
+        return 'fake_alias : echo fake\n'
+
+    def cmd_sv_cmd(self, args):
+        action, _, rest = args.partition(' ')
+        cvar, _, value = rest.partition(' ')
+        entries = self.cvars.get(cvar, '').split()
+        if action == 'addtolist' and value not in entries:
+            entries.append(value)
+        elif action == 'removefromlist' and value in entries:
+            entries.remove(value)
+        self.cvars[cvar] = ' '.join(entries)
+        return ''
+
+    def status_response(self, challenge):
+        info = {'gamename': 'Xonotic', 'protocol': '3', 'hostname': self.cvars['hostname'],
+                'mapname': self.map_name, 'clients': str(len(self.players)),
+                'sv_maxclients': self.cvars['sv_maxclients']}
+        if challenge:
+            info['challenge'] = challenge.decode('utf8', 'replace')
+        infostring = ''.join('\\{}\\{}'.format(k, v) for k, v in info.items())
+        players = ''.join('{} {} "{}"\n'.format(p.frags, p.ping, p.name) for p in self.players.values())
+        return STATUS_RESPONSE_HEADER + (infostring + '\n' + players).encode('utf8')
+
+    def log_destinations(self):
+        for entry in self.cvars.get('log_dest_udp', '').split():
+            host, _, port = entry.rpartition(':')
+            yield host, int(port)
+
+    def emit_log(self, lines):
+        """
+        Sends eventlog lines (bytes, without newlines) to every log_dest_udp destination, one datagram per line
+        """
+        destinations = list(self.log_destinations())
+        for line in lines:
+            packet = RCON_RESPONSE_HEADER + line + b'\n'
+            for destination in destinations:
+                self.transport.sendto(packet, destination)
+
+    def start_eventlog(self, lines=None, rate=1000, loop=None):
+        """
+        Replays ``lines`` (the sample eventlog by default) in a loop at ``rate`` lines per second
+        """
+        if lines is None:
+            with open(EVENTLOG_SAMPLE, 'rb') as f:
+                lines = f.read().splitlines()
+        loop = loop or asyncio.get_event_loop()
+        self.eventlog_task = loop.create_task(self.replay_eventlog(lines, rate))
+        return self.eventlog_task
+
+    async def replay_eventlog(self, lines, rate, tick=0.01):
+        source = itertools.cycle(lines)
+        started = time.perf_counter()
+        sent = 0
+        while True:
+            due = int((time.perf_counter() - started) * rate)
+            if due > sent:
+                self.emit_log(itertools.islice(source, due - sent))
+                sent = due
+            await asyncio.sleep(tick)
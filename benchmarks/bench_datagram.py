@@ -0,0 +1,90 @@
+"""
+Log channel receive rate, default transport vs BatchDatagramTransport.
+
+Usage: python -m benchmarks.bench_datagram [--packets 200000]
+
+A separate process replays the recorded log, one line per datagram as DarkPlaces sends them with
+sv_eventlog_console 1, to an RconClient log channel. The rate counts the datagrams that made it through the
+parser; the sender doesn't wait for the receiver, so datagrams the receiver is too slow for are dropped by the
+kernel and reported.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import sys
+import time
+
+from aio_dprcon.client import RconClient
+from aio_dprcon.protocol import RCON_RESPONSE_HEADER
+from aio_dprcon.testing import EVENTLOG_SAMPLE
+
+LOG_PATH = EVENTLOG_SAMPLE
+RECEIVE_BUFFER = 4 * 1024 * 1024
+IDLE_TIMEOUT = 0.5
+
+
+def send(sock, addr, packets, ready):
+    with open(LOG_PATH, 'rb') as f:
+        lines = [RCON_RESPONSE_HEADER + line for line in f.read().splitlines(True)]
+    ready.wait()
+    for i in range(packets):
+        sock.sendto(lines[i % len(lines)], addr)
+    sock.close()
+
+
+class CountingClient(RconClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = 0
+        self.first = self.last = None
+
+    def custom_log_callback(self, data, addr):
+        self.received += 1
+        self.last = time.perf_counter()
+        if self.first is None:
+            self.first = self.last
+
+
+def measure(batch, packets):
+    loop = asyncio.new_event_loop()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.bind(('127.0.0.1', 0))
+    host, port = sender.getsockname()
+    client = CountingClient(loop, host, port, log_sink=False, batch=batch)
+    transport, _ = loop.run_until_complete(client._connect(client.log_data_received, log=True,
+                                                           batch_callback=client.log_batch_received))
+    transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=send, args=(sender, transport.get_extra_info('sockname'), packets, ready))
+    process.start()
+    sender.close()
+
+    async def __receive():
+        ready.set()
+        while True:
+            received = client.received
+            await asyncio.sleep(IDLE_TIMEOUT)
+            if client.received == received and (received or not process.is_alive()):
+                return
+
+    loop.run_until_complete(__receive())
+    process.join()
+    transport.close()
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+    elapsed = (client.last - client.first) if client.received > 1 else float('nan')
+    return client.received, client.received / elapsed
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--packets', type=int, default=200000)
+    args = arg_parser.parse_args(argv)
+    for name, batch in (('default', False), ('batch', True)):
+        received, rate = measure(batch, args.packets)
+        print('{:>8}: {:>10.0f} packets/sec, {} of {} received'.format(name, rate, received, args.packets))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
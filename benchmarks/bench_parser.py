@@ -0,0 +1,76 @@
+"""
+Parser throughput on a recorded log.
+
+Usage: python -m benchmarks.bench_parser [--baseline GIT_REV] [--repeat N]
+
+The recorded log is replayed in datagram sized chunks through the CombinedParser used for the command channel.
+With --baseline the parser module from that git revision is measured as well.
+"""
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+from aio_dprcon import parser
+from aio_dprcon.testing import EVENTLOG_SAMPLE
+
+LOG_PATH = EVENTLOG_SAMPLE
+DATAGRAM_SIZE = 1400
+CMD_PARSERS = ['StatusItemParser', 'CvarParser', 'AproposCvarParser', 'AproposAliasCommandParser', 'CvarListParser']
+
+
+class DummyServer:
+    def __init__(self):
+        self.status = {}
+        self.cvars = {}
+        self.completions = {'cvar': {}, 'alias': {}, 'command': {}}
+
+    def key_received(self, namespace, key):
+        pass
+
+
+def load_datagrams(repeat):
+    with open(LOG_PATH, 'rb') as f:
+        data = f.read() * repeat
+    return [data[i:i + DATAGRAM_SIZE] for i in range(0, len(data), DATAGRAM_SIZE)], data.count(b'\n')
+
+
+def load_module_from_git(rev, path='aio_dprcon/parser.py'):
+    source = subprocess.check_output(['git', 'show', '{}:{}'.format(rev, path)],
+                                     cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    spec = importlib.util.spec_from_loader('baseline_parser', loader=None)
+    module = importlib.util.module_from_spec(spec)
+    exec(compile(source, path, 'exec'), module.__dict__)
+    return module
+
+
+def measure(module, datagrams, rounds=5):
+    best = None
+    for _ in range(rounds):
+        combined = module.CombinedParser(DummyServer(), parsers=[getattr(module, i) for i in CMD_PARSERS])
+        t = time.perf_counter()
+        for datagram in datagrams:
+            combined.feed(datagram)
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--baseline', help='git revision to compare against')
+    arg_parser.add_argument('--repeat', type=int, default=200, help='how many times to replay the log')
+    args = arg_parser.parse_args(argv)
+    datagrams, lines = load_datagrams(args.repeat)
+    candidates = [('current', parser)]
+    if args.baseline:
+        candidates.insert(0, (args.baseline, load_module_from_git(args.baseline)))
+    for name, module in candidates:
+        elapsed = measure(module, datagrams)
+        print('{:>12}: {:>10.0f} lines/sec ({} lines in {:.3f}s)'.format(name, lines / elapsed, lines, elapsed))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Secure rcon packet signing rate.
+
+Usage: python -m benchmarks.bench_signing [--seconds 1]
+
+Compares building a new HMAC for every packet, as the packet builders used to, with RconSigner, for the
+MD4 implementation in use (hashlib when OpenSSL provides it, aio_dprcon.md4 otherwise).
+"""
+import argparse
+import hmac
+import sys
+import time
+
+from aio_dprcon import protocol
+from aio_dprcon.protocol import RconSigner, ensure_bytes, md4
+
+PASSWORD = 'secret rcon password'
+COMMAND = 'status 1'
+
+
+def per_packet_hmac(challenge):
+    msg = b' '.join([challenge, ensure_bytes(COMMAND)])
+    return hmac.new(ensure_bytes(PASSWORD), msg, md4).digest()
+
+
+def rate(func, seconds):
+    count = 0
+    t = time.perf_counter()
+    deadline = t + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            func()
+        count += 100
+    return count / (time.perf_counter() - t)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--seconds', type=float, default=1)
+    args = arg_parser.parse_args(argv)
+    signer = RconSigner(PASSWORD)
+    challenge = b'11111111111'
+    md4()
+    print('MD4 implementation: {}'.format(protocol.md4_constructor.__module__))
+    for name, func in (('hmac.new per packet', lambda: per_packet_hmac(challenge)),
+                       ('RconSigner', lambda: signer.challenge_packet(challenge, COMMAND))):
+        print('{:>20}: {:>10.0f} packets/sec'.format(name, rate(func, args.seconds)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
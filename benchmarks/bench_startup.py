@@ -0,0 +1,56 @@
+"""
+CLI startup time report.
+
+Usage: python -m benchmarks.bench_startup [--module aio_dprcon.cli] [--top 15] [--runs 10]
+
+Runs ``python -X importtime -c "import MODULE"`` in a fresh interpreter, prints the modules with the biggest
+cumulative import time and the median wall time of starting the interpreter and importing the module.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+def import_times(module):
+    """
+    Returns a list of (module name, self microseconds, cumulative microseconds) in import order
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    times = []
+    for line in result.stderr.decode('utf8').splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def wall_time(module, runs):
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import {}'.format(module)], check=True)
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--module', default='aio_dprcon.cli')
+    arg_parser.add_argument('--top', type=int, default=15)
+    arg_parser.add_argument('--runs', type=int, default=10)
+    args = arg_parser.parse_args(argv)
+    times = import_times(args.module)
+    print('{} modules imported'.format(len(times)))
+    print('{:>12} {:>12}  module'.format('self [us]', 'cumul. [us]'))
+    for name, self_us, cumulative_us in sorted(times, key=lambda i: -i[2])[:args.top]:
+        print('{:>12} {:>12}  {}'.format(self_us, cumulative_us, name))
+    print('median wall time of "python -c \'import {}\'": {:.1f} ms'.format(
+        args.module, wall_time(args.module, args.runs) * 1000))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Offline benchmark suite against a local FakeDarkplacesServer.
+
+Usage: python -m benchmarks.run [--quick] [--save results.json] [--compare results.json]
+
+Measures command latency for every rcon security mode, parser throughput, packet signing rate and the time to
+query many servers at once through an RconPool. Clients run without rate limiting so that the protocol path
+itself is measured. With --compare every result is printed next to a saved run.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from aio_dprcon import parser
+from aio_dprcon.client import RconClient
+from aio_dprcon.pool import RconPool
+from aio_dprcon.protocol import RconSigner, RCON_NOSECURE, RCON_SECURE_TIME, RCON_SECURE_CHALLENGE
+from aio_dprcon.testing import FakeDarkplacesServer
+
+from . import bench_parser, bench_signing
+
+PASSWORD = 'benchmark'
+MODES = (('nosecure', RCON_NOSECURE), ('time', RCON_SECURE_TIME), ('challenge', RCON_SECURE_CHALLENGE))
+
+
+def command_latency(loop, secure, commands):
+    server = loop.run_until_complete(FakeDarkplacesServer(PASSWORD, secure).start(loop))
+    client = RconClient(loop, *server.address, password=PASSWORD, secure=secure, log_sink=False, rate=None)
+
+    async def __run():
+        await client.open()
+        samples = []
+        for i in range(commands):
+            t = time.perf_counter()
+            await client.execute('echo {}'.format(i))
+            samples.append(time.perf_counter() - t)
+        return samples
+
+    samples = sorted(loop.run_until_complete(__run()))
+    client.cmd_transport.close()
+    server.close()
+    return {'median_ms': statistics.median(samples) * 1000, 'p99_ms': samples[int(len(samples) * 0.99)] * 1000}
+
+
+def pool_scaling(loop, servers, rounds):
+    fakes = [loop.run_until_complete(FakeDarkplacesServer(PASSWORD).start(loop)) for _ in range(servers)]
+    pool = RconPool(loop)
+    for i, fake in enumerate(fakes):
+        pool.add_server('s{}'.format(i), *fake.address, password=PASSWORD, log_sink=False, rate=None)
+
+    async def __run():
+        best = None
+        for _ in range(rounds):
+            t = time.perf_counter()
+            results = [await i for i in pool.broadcast('status 1', timeout=5)]
+            elapsed = time.perf_counter() - t
+            assert all(result.error is None for result in results)
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    elapsed = loop.run_until_complete(__run())
+    pool.close()
+    for fake in fakes:
+        fake.close()
+    return {'total_ms': elapsed * 1000, 'per_server_us': elapsed / servers * 1e6}
+
+
+def run(quick=False):
+    results = {}
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    commands = 100 if quick else 1000
+    for name, secure in MODES:
+        results['latency.' + name] = command_latency(loop, secure, commands)
+    datagrams, lines = bench_parser.load_datagrams(20 if quick else 200)
+    results['parser'] = {'lines_per_sec': lines / bench_parser.measure(parser, datagrams)}
+    signer = RconSigner(PASSWORD)
+    results['signing'] = {'packets_per_sec': bench_signing.rate(
+        lambda: signer.challenge_packet(b'11111111111', 'status 1'), 0.2 if quick else 1)}
+    for servers in ((1, 10) if quick else (1, 10, 100)):
+        results['pool.{}'.format(servers)] = pool_scaling(loop, servers, 3 if quick else 10)
+    loop.close()
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--quick', action='store_true', help='fewer iterations, for a smoke test')
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    arg_parser.add_argument('--compare', help='JSON file of a previous run to compare against')
+    args = arg_parser.parse_args(argv)
+    results = run(args.quick)
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    for name, values in results.items():
+        for key, value in values.items():
+            line = '{:>20} {:>14}: {:>14.2f}'.format(name, key, value)
+            old = previous.get(name, {}).get(key)
+            if old:
+                line += '  (was {:.2f}, {:+.1f}%)'.format(old, (value - old) / old * 100)
+            print(line)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
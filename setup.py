@@ -9,7 +9,8 @@ setup(name='aio-dprcon',
       author='Nick Savchenko',
       author_email='nsavch@gmail.com',
       license='GPLv3',
-      packages=find_packages(),
+      packages=find_packages(exclude=['benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
+      package_data={'aio_dprcon': ['data/*.log']},
       keywords='xonotic',
       install_requires=[
           'setuptools',
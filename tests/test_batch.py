@@ -0,0 +1,67 @@
+import asyncio
+import socket
+
+from aio_dprcon.batch import create_batch_datagram_endpoint
+from aio_dprcon.client import RconClient
+from aio_dprcon.protocol import RCON_RESPONSE_HEADER
+
+
+class BatchCollector(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        self.batches = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagrams_received(self, datagrams):
+        self.batches.append(datagrams)
+
+
+def test_batch_transport():
+    loop = asyncio.new_event_loop()
+    transport, protocol = loop.run_until_complete(
+        create_batch_datagram_endpoint(loop, BatchCollector, local_addr=('127.0.0.1', 0)))
+    addr = transport.get_extra_info('sockname')
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for i in range(10):
+        sender.sendto(b'packet %d' % i, addr)
+    loop.run_until_complete(asyncio.sleep(0.05))
+    received = [data for batch in protocol.batches for data, _ in batch]
+    assert received == [b'packet %d' % i for i in range(10)]
+    assert len(protocol.batches) < 10
+
+    sender.settimeout(1)
+    for i in range(3):
+        transport.sendto(b'reply %d' % i, sender.getsockname())
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert [sender.recvfrom(100)[0] for _ in range(3)] == [b'reply 0', b'reply 1', b'reply 2']
+    transport.close()
+    sender.close()
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+
+
+def test_client_log_batch():
+    loop = asyncio.new_event_loop()
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    client = RconClient(loop, '127.0.0.1', server.getsockname()[1], log_sink=False, batch=True)
+
+    async def __receive():
+        transport, _ = await client._connect(client.log_data_received, log=True,
+                                             batch_callback=client.log_batch_received)
+        stream = client.events('join')
+        lines = [b':join:%d:%d:127.0.0.1:player%d\n' % (i, i, i) for i in range(5)]
+        # The line split between two datagrams is joined back by the parser
+        lines[2:3] = [lines[2][:5], lines[2][5:]]
+        for line in lines:
+            server.sendto(RCON_RESPONSE_HEADER + line, transport.get_extra_info('sockname'))
+        events = [await asyncio.wait_for(stream.__anext__(), 1) for _ in range(5)]
+        transport.close()
+        return events
+
+    events = loop.run_until_complete(__receive())
+    assert [e.nick for e in events] == ['player%d' % i for i in range(5)]
+    server.close()
+    loop.close()
@@ -1,6 +1,15 @@
 import asyncio
+import io
 import time
 
+import pytest
+
+from aio_dprcon.client import RconClient
+from aio_dprcon.exceptions import RconCommandTimeout
+from aio_dprcon.protocol import RCON_SECURE_CHALLENGE
+from aio_dprcon.sinks import StreamSink
+from aio_dprcon.testing import FakeDarkplacesServer
+
 
 def test_connect_once(loop, rcon_client, dummy_status):
     async def __send_status_data(c):
@@ -33,3 +42,150 @@ def test_connect_forever(loop, rcon_client, dummy_status):
         asyncio.wait(tasks, loop=loop, return_when=asyncio.FIRST_COMPLETED))
     for task in pending:
         task.cancel()
+
+
+def test_reconnect_closes_previous_channel():
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(FakeDarkplacesServer(secure=RCON_SECURE_CHALLENGE).start(loop))
+    client = RconClient(loop, *server.address, password='secret', secure=RCON_SECURE_CHALLENGE, log_sink=False)
+    assert loop.run_until_complete(client.connect_once())
+    old_transport, old_protocol = client.cmd_transport, client.cmd_protocol
+    assert loop.run_until_complete(client.connect_once())
+    assert client.cmd_transport is not old_transport
+    assert old_transport.is_closing()
+    loop.run_until_complete(asyncio.sleep(0))
+    assert old_protocol.challenge_timer is None
+    client.close()
+    assert client.cmd_protocol is None
+    server.close()
+    loop.close()
+
+
+def test_execute(loop, rcon_client):
+    addr = (rcon_client.remote_host, rcon_client.remote_port)
+
+    async def __reply(c):
+        await asyncio.sleep(0.1)
+        c.cmd_data_received(b'first line\nsecond ', addr)
+        c.cmd_data_received(b'line\naio_dprcon_eoc_1 \n', addr)
+
+    async def __execute(c):
+        result, _ = await asyncio.gather(c.execute('cvarlist g_'), __reply(c))
+        return result
+
+    result = loop.run_until_complete(__execute(rcon_client))
+    assert result == b'first line\nsecond line\n'
+    # The marker is queued together with the command, so that no other command gets between them
+    assert rcon_client.send.call_args_list[0][0] == ('cvarlist g_', 'echo aio_dprcon_eoc_1')
+    assert not rcon_client.pending_responses
+
+
+def test_execute_coalesce(loop, rcon_client):
+    addr = (rcon_client.remote_host, rcon_client.remote_port)
+
+    async def __reply(c):
+        await asyncio.sleep(0.1)
+        c.cmd_data_received(b'map: dance\naio_dprcon_eoc_1 \n', addr)
+
+    async def __execute(c):
+        return await asyncio.gather(c.execute('status', coalesce=True), c.execute('status', coalesce=True),
+                                    __reply(c))
+
+    first, second, _ = loop.run_until_complete(__execute(rcon_client))
+    assert first == second == b'map: dance\n'
+    assert rcon_client.send.call_count == 1
+    assert not rcon_client.shared_responses
+
+
+def test_execute_coalesce_outlives_first_timeout(loop, rcon_client):
+    addr = (rcon_client.remote_host, rcon_client.remote_port)
+
+    async def __reply(c):
+        await asyncio.sleep(0.2)
+        c.cmd_data_received(b'map: dance\naio_dprcon_eoc_1 \n', addr)
+
+    async def __first(c):
+        try:
+            await c.execute('status', timeout=0.1, coalesce=True)
+        except RconCommandTimeout:
+            return 'timeout'
+
+    async def __execute(c):
+        return await asyncio.gather(__first(c), c.execute('status', timeout=1, coalesce=True), __reply(c))
+
+    first, second, _ = loop.run_until_complete(__execute(rcon_client))
+    assert first == 'timeout'
+    assert second == b'map: dance\n'
+    assert rcon_client.send.call_count == 1
+    assert not rcon_client.shared_responses and not rcon_client.pending_responses
+    assert not rcon_client.response_waiters
+
+
+
+def test_execute_coalesce_after_response_arrived(loop, rcon_client):
+    addr = (rcon_client.remote_host, rcon_client.remote_port)
+
+    async def __execute(c):
+        first = loop.create_task(c.execute('status', coalesce=True))
+        await asyncio.sleep(0)
+        # The response is complete, but the first caller hasn't resumed yet
+        c.cmd_data_received(b'map: dance\naio_dprcon_eoc_1 \n', addr)
+        second = await c.execute('status', coalesce=True)
+        return await first, second
+
+    first, second = loop.run_until_complete(__execute(rcon_client))
+    assert first == second == b'map: dance\n'
+    assert rcon_client.send.call_count == 1
+    assert not rcon_client.shared_responses and not rcon_client.pending_responses
+    assert not rcon_client.response_waiters
+
+
+def test_execute_cleans_up_when_send_fails(loop, rcon_client):
+    rcon_client.send.side_effect = AttributeError("'NoneType' object has no attribute 'send'")
+    for _ in range(2):
+        with pytest.raises(AttributeError):
+            loop.run_until_complete(rcon_client.execute('status', coalesce=True))
+    # The second call wasn't coalesced with the first, failed one
+    assert rcon_client.send.call_count == 2
+    assert not rcon_client.shared_responses and not rcon_client.pending_responses
+    assert not rcon_client.response_waiters
+
+def test_parse_listing():
+    from aio_dprcon.client import RconClient
+    from aio_dprcon.parser import ResultsParser, CvarListParser
+    collector = RconClient.parse_listing(b'g_a is "1" ["1"] a\ng_b is "2" ["2"] b\n3 cvars beginning with "g_"\n',
+                                         [ResultsParser, CvarListParser])
+    assert collector.results == 3
+    assert sorted(collector.completions['cvar']) == ['g_a', 'g_b']
+
+
+def test_literal_addrs():
+    loop = asyncio.new_event_loop()
+    client = RconClient(loop, '::0001', 26000, log_sink=False)
+    assert client.remote_addrs == {('::1', 26000)}
+    assert client.verify_data(b'', ('::1', 26000, 0, 0))
+    assert not client.verify_data(b'', ('::1', 26001, 0, 0))
+    client = RconClient(loop, 'localhost', 26000, log_sink=False)
+    assert not client.verify_data(b'', ('127.0.0.1', 26000))
+    loop.run_until_complete(client.resolve())
+    assert client.verify_data(b'', ('127.0.0.1', 26000))
+    loop.close()
+
+
+def test_close_writes_out_the_log():
+    loop = asyncio.new_event_loop()
+    stream = io.BytesIO()
+    client = RconClient(loop, '127.0.0.1', 26000, log_sink=StreamSink(loop, stream))
+    client.log_data_received(b':gamestart:dm_dance:1\n', ('127.0.0.1', 26000))
+    assert stream.getvalue() == b''
+    client.close()
+    assert stream.getvalue() == b':gamestart:dm_dance:1\n'
+    loop.close()
+
+
+def test_completion_index_learns_names(rcon_client):
+    addr = (rcon_client.remote_host, rcon_client.remote_port)
+    assert rcon_client.completion_index.complete('g_') == []
+    rcon_client.cmd_data_received(b'cvar ^7g_balance_health_start^7 is "100" [""] health\n', addr)
+    assert rcon_client.completion_index.complete('g_') == ['g_balance_health_start']
+    assert rcon_client.completion_index.complete_value('g_balance_health_start', '') == ['100']
@@ -0,0 +1,48 @@
+from aio_dprcon.client import RconClient
+from aio_dprcon.completion import CompletionIndex, CompletionCache
+
+
+def test_completion_index():
+    index = CompletionIndex({'cvar': {'sv_gravity': '800', 'sv_cheats': None, 'g_maplist': 'a b'},
+                             'alias': {'sv_restart_all': None, 'gotomap': None},
+                             'command': {'status': None, 'sv_cmd': None, 'gotomap': None}})
+    assert len(index) == 7
+    assert index.complete('sv_') == ['sv_cheats', 'sv_cmd', 'sv_gravity', 'sv_restart_all']
+    assert index.complete('go') == ['gotomap']
+    assert index.complete('x') == []
+    assert index.complete('') == index.names
+    assert index.complete_value('g_maplist', '') == ['a b']
+    assert index.complete_value('sv_gravity', '9') == []
+    assert index.complete_value('sv_cheats', '') == []
+
+
+def test_completion_cache(tmp_path):
+    completions = {'cvar': {'sv_gravity': '800', 'sv_cheats': None, 'g_maplist': 'a b', 'sv_ф': 'x'},
+                   'alias': {'sv_restart_all': None, 'gotomap': None},
+                   'command': {'status': None, 'sv_cmd': None, 'gotomap': None}}
+    path = str(tmp_path / 'completions.test')
+    CompletionCache.write(path, completions, {'version': 'Xonotic build 1', 'protocol': '3504 (DP7)'})
+    assert CompletionCache.is_cache(path)
+    cache = CompletionCache(path)
+    index = CompletionIndex(completions)
+    assert cache.meta == {'version': 'Xonotic build 1', 'protocol': '3504 (DP7)'}
+    assert len(cache) == len(index) == 8
+    for prefix in ('', 's', 'sv_', 'sv_c', 'go', 'x', 'sv_ф', 'ф'):
+        assert cache.complete(prefix) == index.complete(prefix)
+    for name in ('g_maplist', 'sv_cheats', 'gotomap', 'sv_ф', 'zzz', ''):
+        assert cache.complete_value(name, '') == index.complete_value(name, '')
+    cache.close()
+
+
+def test_client_completes_from_cache_and_live_names(tmp_path, loop):
+    path = str(tmp_path / 'completions.test')
+    CompletionCache.write(path, {'cvar': {'sv_gravity': '800', 'g_maplist': 'a b'}, 'alias': {}, 'command': {}})
+    client = RconClient(loop, '127.0.0.1', 26000, log_sink=False)
+    client.completion_cache = CompletionCache(path)
+    client.cmd_data_received(b'cvar ^7sv_cheats^7 is "1" [""] cheats\ncvar ^7sv_gravity^7 is "600" [""] g\n',
+                             ('127.0.0.1', 26000))
+    assert client.completion_index.complete('sv_') == ['sv_cheats', 'sv_gravity']
+    assert client.completion_index.complete_value('sv_gravity', '') == ['600']
+    assert client.completion_index.complete_value('g_maplist', '') == ['a b']
+    client.completion_cache.close()
+
@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+from aio_dprcon.listener import LogListener
+from aio_dprcon.protocol import QUAKE_PACKET_HEADER, RCON_RESPONSE_HEADER
+
+
+class LogDestServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        self.log_dest_udp = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        _, password, command = data[len(QUAKE_PACKET_HEADER):].split(b' ', 2)
+        if command == b'log_dest_udp':
+            response = b'"log_dest_udp" is "' + self.log_dest_udp + b'" ["" ]\n'
+            self.transport.sendto(RCON_RESPONSE_HEADER + response, addr)
+        elif command.startswith(b'sv_cmd addtolist log_dest_udp '):
+            self.log_dest_udp = command.rsplit(b' ', 1)[1]
+
+
+def test_listener_fanout(tmpdir):
+    loop = asyncio.new_event_loop()
+    socket_path = os.path.join(str(tmpdir), 'listener.sock')
+    listener = LogListener(loop, '127.0.0.1', 0, socket_path)
+    sink = listener.add_server('srv', '127.0.0.1', 26000).log_sink
+
+    async def __consume():
+        await listener.start()
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        await asyncio.sleep(0.01)
+        sink.write(b':join:1:1:127.0.0.1:player\n:pa')
+        sink.write(b'rt:1\n')
+        lines = [await asyncio.wait_for(reader.readline(), 1) for _ in range(2)]
+        writer.close()
+        await asyncio.sleep(0.01)
+        return lines
+
+    assert loop.run_until_complete(__consume()) == [b'srv :join:1:1:127.0.0.1:player\n', b'srv :part:1\n']
+    listener.close()
+    assert not os.path.exists(socket_path)
+    loop.close()
+
+
+def test_listener_registration(tmpdir):
+    loop = asyncio.new_event_loop()
+    transport, server = loop.run_until_complete(loop.create_datagram_endpoint(
+        LogDestServerProtocol, local_addr=('127.0.0.1', 0)))
+    listener = LogListener(loop, '127.0.0.1', 0, os.path.join(str(tmpdir), 'listener.sock'))
+    client = listener.add_server('srv', '127.0.0.1', transport.get_extra_info('sockname')[1], password='12345')
+
+    async def __check():
+        await listener.start()
+        await client.open()
+        client.log_transport, client.log_protocol = await client._connect(client.log_data_received, log=True)
+        registered = [await listener.check_registration(client)]
+        await asyncio.sleep(0.05)
+        registered.append(await listener.check_registration(client))
+        return registered
+
+    assert loop.run_until_complete(__check()) == [False, True]
+    port = listener.pool.log_router.transport.get_extra_info('sockname')[1]
+    assert server.log_dest_udp == b'127.0.0.1:%d' % port
+    listener.close()
+    transport.close()
+    loop.close()
+
+
+def test_listener_registration_survives_failing_server(tmpdir, mocker):
+    loop = asyncio.new_event_loop()
+    transport, server = loop.run_until_complete(loop.create_datagram_endpoint(
+        LogDestServerProtocol, local_addr=('127.0.0.1', 0)))
+    listener = LogListener(loop, '127.0.0.1', 0, os.path.join(str(tmpdir), 'listener.sock'))
+    port = transport.get_extra_info('sockname')[1]
+    clients = [listener.add_server(name, '127.0.0.1', port, password='12345') for name in ('broken', 'srv')]
+    mocker.patch.object(clients[0], 'execute_with_retry', side_effect=AttributeError('broken'))
+
+    async def __check():
+        await listener.start()
+        for client in clients:
+            await client.open()
+            client.log_transport, client.log_protocol = await client._connect(client.log_data_received, log=True)
+            client.connected = True
+        await listener.check_registrations()
+        await asyncio.sleep(0.05)
+
+    loop.run_until_complete(__check())
+    port = listener.pool.log_router.transport.get_extra_info('sockname')[1]
+    assert server.log_dest_udp == b'127.0.0.1:%d' % port
+    listener.close()
+    transport.close()
+    loop.close()
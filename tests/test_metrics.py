@@ -0,0 +1,70 @@
+import asyncio
+
+from aio_dprcon.client import RconClient
+from aio_dprcon.metrics import Metrics, Tracer, format_prometheus, start_prometheus_server
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.calls = []
+
+    def receive(self, client, channel, data, addr):
+        self.calls.append(('receive', channel, data))
+
+    def parse(self, client, channel, data, seconds):
+        self.calls.append(('parse', channel, data))
+
+
+def test_histogram_snapshot():
+    metrics = Metrics()
+    histogram = metrics.histogram('rtt_seconds', buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    metrics.counter('sent_total').inc(3)
+    assert metrics.snapshot() == {'rtt_seconds': {'buckets': [(0.1, 2), (1, 3), (float('inf'), 4)], 'sum': 3.65,
+                                                  'count': 4},
+                                  'sent_total': 3}
+
+
+def test_client_metrics(loop):
+    client = RconClient(loop, '127.0.0.1', 26000, log_sink=False)
+    client.tracer = RecordingTracer()
+    client.cmd_data_received(b'"g_maplist" is "a b"\n', ('127.0.0.1', 26000))
+    client.cmd_data_received(b'"sv_gravity" is "800"\n', ('127.0.0.2', 26000))
+    client.cmd_parser.parser_instances[0].process = None
+    client.cmd_data_received(b'host: test\n', ('127.0.0.1', 26000))
+    snapshot = client.metrics.snapshot()
+    assert snapshot['cmd_packets_received_total'] == 3
+    assert snapshot['packets_dropped_total'] == 1
+    assert snapshot['lines_parsed_total'] == 2
+    assert snapshot['parse_errors_total'] == 1
+    assert snapshot['parse_seconds']['count'] == 2
+    assert [call[:2] for call in client.tracer.calls] == [('receive', 'cmd'), ('parse', 'cmd'), ('receive', 'cmd'),
+                                                          ('receive', 'cmd'), ('parse', 'cmd')]
+
+
+def test_prometheus_export():
+    loop = asyncio.new_event_loop()
+    metrics = Metrics()
+    metrics.counter('sent_total', 'Packets sent').inc(2)
+    metrics.histogram('rtt_seconds', buckets=(1, )).observe(0.5)
+    text = format_prometheus({'srv"1': metrics})
+    assert '# HELP dprcon_sent_total Packets sent\n# TYPE dprcon_sent_total counter\n' in text
+    assert 'dprcon_sent_total{server="srv\\"1"} 2\n' in text
+    assert 'dprcon_rtt_seconds_bucket{server="srv\\"1",le="+Inf"} 1\n' in text
+
+    async def __scrape():
+        server = await start_prometheus_server(lambda: {'srv"1': metrics}, port=0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    response = loop.run_until_complete(__scrape())
+    assert response.startswith(b'HTTP/1.0 200 OK\r\n')
+    assert response.endswith(text.encode('utf8'))
+    loop.close()
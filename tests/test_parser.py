@@ -0,0 +1,67 @@
+from unittest.mock import Mock
+
+from aio_dprcon.parser import CombinedParser, StatusItemParser, CvarParser, CvarListParser, BaseMultilineParser, \
+    EventLogParser
+
+
+class DummyServer:
+    def __init__(self):
+        self.status = {}
+        self.cvars = {}
+        self.completions = {'cvar': {}, 'alias': {}, 'command': {}}
+        self.key_received = Mock()
+
+
+class ListParser(BaseMultilineParser):
+    key = b'BEGIN '
+    terminator = b'END'
+
+    def process(self, data):
+        self.rcon_server.lists.append(data)
+
+
+def test_combined_parser_split_lines(dummy_status):
+    server = DummyServer()
+    parser = CombinedParser(server, [StatusItemParser, CvarParser])
+    for i in range(0, len(dummy_status), 7):
+        parser.feed(dummy_status[i:i + 7])
+    parser.feed(b'"sv_adminnick" is "admin"\n"g_maplist" is "')
+    assert server.status['map'] == 'inder-whoot2'
+    assert server.status['players'] == '0 active (16 max)'
+    assert server.cvars == {'sv_adminnick': 'admin'}
+    parser.feed(b'a b"\n')
+    assert server.cvars['g_maplist'] == 'a b'
+    assert not parser.buffer
+
+
+def test_combined_parser_multiline():
+    server = DummyServer()
+    server.lists = []
+    parser = CombinedParser(server, [ListParser, CvarParser])
+    parser.feed(b'BEGIN one\ntwo\n"x" is "1"\nEND\n"y" is "2"\nBEGIN three\nEND\n')
+    assert server.lists == [[b'one', b'two', b'"x" is "1"'], [b'three']]
+    assert server.cvars == {'y': '2'}
+
+
+def test_combined_parser_dispatch():
+    server = DummyServer()
+    parser = CombinedParser(server, [CvarParser, CvarListParser])
+    assert parser.dispatch is not None
+    parser.feed(b'"g_maplist" is "a b"\nsv_gravity is "800" ["800"] gravity\n:join:1:1:bot:Lion\n')
+    assert server.cvars == {'g_maplist': 'a b'}
+    assert server.completions['cvar'] == {'sv_gravity': '800'}
+
+
+def test_event_log_parser():
+    from aio_dprcon.events import JoinEvent, KillEvent, Event, ALL_EVENTS
+    server = DummyServer()
+    server.event_kinds = frozenset([b'join', b'kill'])
+    server.event_received = Mock()
+    parser = CombinedParser(server, [EventLogParser])
+    parser.feed(b':join:1:1:192.168.0.10:^1Red:Baron\n:part:1\n:kill:frag:1:2:type=mortar:items=4:victimitems=3\n')
+    events = [i[0][0] for i in server.event_received.call_args_list]
+    assert events == [JoinEvent(1, 1, '192.168.0.10', '^1Red:Baron'),
+                      KillEvent('frag', 1, 2, {'type': 'mortar', 'items': '4', 'victimitems': '3'})]
+    server.event_kinds = ALL_EVENTS
+    parser.feed(b':vote:vcall:1:endmatch\n')
+    assert server.event_received.call_args[0][0] == Event('vote', ['vcall', '1', 'endmatch'])
@@ -0,0 +1,94 @@
+import asyncio
+
+from aio_dprcon.pool import RconPool
+from aio_dprcon.protocol import QUAKE_PACKET_HEADER, RCON_RESPONSE_HEADER
+
+STATUS_TABLE_HEADER = b'^2IP                                             %pl ping  time   frags  no   name\n'
+
+
+class EchoServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, host):
+        self.host = host
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        _, password, command = data[len(QUAKE_PACKET_HEADER):].split(b' ', 2)
+        if command == b'status 1':
+            response = b'host: ' + self.host + b'\nplayers: 0 active (16 max)\n\n' + STATUS_TABLE_HEADER
+        elif command.startswith(b'echo '):
+            response = command[5:] + b' \n'
+        else:
+            response = b'Unknown command "' + command + b'"\n'
+        self.transport.sendto(RCON_RESPONSE_HEADER + response, addr)
+
+
+def test_pool_single_socket():
+    loop = asyncio.new_event_loop()
+    servers = []
+    for i in range(3):
+        transport, _ = loop.run_until_complete(loop.create_datagram_endpoint(
+            lambda i=i: EchoServerProtocol(b'server%d' % i), local_addr=('127.0.0.1', 0)))
+        servers.append(transport)
+    pool = RconPool(loop)
+    for i, transport in enumerate(servers):
+        pool.add_server('s%d' % i, '127.0.0.1', transport.get_extra_info('sockname')[1], password='12345')
+
+    async def __connect_all():
+        return await asyncio.gather(*[c.connect_once() for c in pool.clients.values()])
+
+    assert loop.run_until_complete(__connect_all()) == [True] * 3
+    assert [c.status['host'] for c in pool.clients.values()] == ['server0', 'server1', 'server2']
+    assert len({c.cmd_transport for c in pool.clients.values()}) == 1
+    assert loop.run_until_complete(pool.clients['s1'].execute('foo')) == b'Unknown command "foo"\n'
+    old_protocol = pool.clients['s0'].cmd_protocol
+    assert loop.run_until_complete(pool.clients['s0'].connect_once())
+    assert pool.clients['s0'].cmd_protocol is not old_protocol
+    assert old_protocol not in pool.cmd_router.routes.values()
+    assert len(pool.cmd_router.routes) == 3
+    pool.remove_server('s1')
+    assert len(pool.cmd_router.routes) == 2
+    pool.close()
+    for transport in servers:
+        transport.close()
+    loop.close()
+
+
+def test_pool_broadcast():
+    loop = asyncio.new_event_loop()
+    transport, _ = loop.run_until_complete(loop.create_datagram_endpoint(
+        lambda: EchoServerProtocol(b'server'), local_addr=('127.0.0.1', 0)))
+    pool = RconPool(loop)
+    pool.add_server('up', '127.0.0.1', transport.get_extra_info('sockname')[1], password='12345')
+    pool.add_server('down', '127.0.0.1', 9, password='12345')
+
+    async def __broadcast():
+        return [await i for i in pool.broadcast('status 1', timeout=0.3)]
+
+    results = loop.run_until_complete(__broadcast())
+    assert [i.name for i in results] == ['up', 'down']
+    assert results[0].response == b'host: server\nplayers: 0 active (16 max)\n\n' + STATUS_TABLE_HEADER
+    assert results[0].error is None
+    assert results[1].error is not None
+    pool.close()
+    transport.close()
+    loop.close()
+
+
+def test_pool_resolves_hostnames():
+    loop = asyncio.new_event_loop()
+    transport, _ = loop.run_until_complete(loop.create_datagram_endpoint(
+        lambda: EchoServerProtocol(b'server'), local_addr=('127.0.0.1', 0)))
+    port = transport.get_extra_info('sockname')[1]
+    pool = RconPool(loop)
+    client = pool.add_server('byname', 'localhost', port, password='12345')
+    assert not client.remote_addrs
+    assert loop.run_until_complete(client.connect_once())
+    assert ('127.0.0.1', port) in pool.cmd_router.routes
+    assert client.verify_data(b'', ('127.0.0.1', port, 0, 0))
+    assert not client.verify_data(b'', ('127.0.0.2', port))
+    pool.close()
+    transport.close()
+    loop.close()
@@ -0,0 +1,57 @@
+import asyncio
+
+from aio_dprcon.probe import Prober, ProbePlayer, parse_status_response
+from aio_dprcon.protocol import QUAKE_STATUS_PACKET, STATUS_RESPONSE_HEADER, PING_Q2_PACKET, PONG_Q2_PACKET
+
+
+class StatusServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, mapname):
+        self.mapname = mapname
+        self.transport = None
+        self.requests = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.requests += 1
+        if data.startswith(QUAKE_STATUS_PACKET):
+            challenge = data[len(QUAKE_STATUS_PACKET) + 1:]
+            self.transport.sendto(STATUS_RESPONSE_HEADER + b'\\gamename\\Xonotic\\mapname\\' + self.mapname +
+                                  b'\\sv_maxclients\\16\\challenge\\' + challenge + b'\n' +
+                                  b'12 50 1 "alice"\n-666 0 "spec"\n', addr)
+        elif data == PING_Q2_PACKET:
+            self.transport.sendto(PONG_Q2_PACKET, addr)
+
+
+def test_parse_status_response():
+    info, players = parse_status_response(STATUS_RESPONSE_HEADER + b'\\hostname\\^1test\\clients\\1\n3 20 "a b"\n')
+    assert info == {'hostname': '^1test', 'clients': '1'}
+    assert players == [ProbePlayer(3, 20, None, 'a b')]
+
+
+def test_prober_sweep():
+    loop = asyncio.new_event_loop()
+    servers = []
+    for i in range(3):
+        transport, _ = loop.run_until_complete(loop.create_datagram_endpoint(
+            lambda i=i: StatusServerProtocol(b'map%d' % i), local_addr=('127.0.0.1', 0)))
+        servers.append(('s%d' % i, '127.0.0.1', transport.get_extra_info('sockname')[1], transport))
+    prober = Prober(loop, timeout=0.2, retries=1)
+
+    async def __sweep():
+        results = [await i for i in prober.sweep([s[:3] for s in servers] + [('down', '127.0.0.1', 9)])]
+        return results, await prober.ping('127.0.0.1', servers[0][2])
+
+    results, rtt = loop.run_until_complete(__sweep())
+    results = dict((r.name, r) for r in results)
+    assert [results['s%d' % i].info['mapname'] for i in range(3)] == ['map0', 'map1', 'map2']
+    assert results['s1'].players == [ProbePlayer(12, 50, 1, 'alice'), ProbePlayer(-666, 0, None, 'spec')]
+    assert results['s1'].rtt >= 0 and results['s1'].error is None
+    assert results['down'].error is not None
+    assert rtt >= 0
+    assert not prober.protocol.status_waiters and not prober.protocol.ping_waiters
+    prober.close()
+    for server in servers:
+        server[3].close()
+    loop.close()
@@ -1,3 +1,4 @@
+import asyncio
 import random
 from unittest.mock import Mock
 
@@ -57,3 +58,53 @@ def test_protocol_secure_time():
     msg = rp.transport.sendto.call_args[0][0]
     assert msg.startswith(QUAKE_PACKET_HEADER)
     assert b'srcon' in msg
+
+
+def test_protocol_secure_challenge():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    transport = MockTransport()
+    transport.sendto = Mock()
+    rp = create_rcon_protocol('12345', 2, Mock())()
+    rp.connection_made(transport)
+    assert transport.sendto.call_args[0][0] == CHALLENGE_PACKET
+    rp.send('status 1')
+    rp.send('sv_cmd foo')
+    assert transport.sendto.call_count == 1
+    rp.datagram_received(CHALLENGE_RESPONSE_HEADER + b'11111111111\x00', ('127.0.0.1', 26000))
+    msg = transport.sendto.call_args_list[1][0][0]
+    assert msg.startswith(QUAKE_PACKET_HEADER + b'srcon HMAC-MD4 CHALLENGE ')
+    assert msg.endswith(b' 11111111111 status 1')
+    assert transport.sendto.call_args_list[2][0][0] == CHALLENGE_PACKET
+    rp.datagram_received(CHALLENGE_RESPONSE_HEADER + b'22222222222\x00', ('127.0.0.1', 26000))
+    assert transport.sendto.call_args_list[3][0][0].endswith(b' 22222222222 sv_cmd foo')
+    rp.datagram_received(CHALLENGE_RESPONSE_HEADER + b'33333333333\x00', ('127.0.0.1', 26000))
+    assert transport.sendto.call_count == 5
+    rp.send('status 1')
+    assert transport.sendto.call_args_list[5][0][0].endswith(b' 33333333333 status 1')
+    rp.connection_lost(None)
+    loop.close()
+
+
+def test_md4_fallback():
+    from aio_dprcon.md4 import MD4
+    assert MD4().hexdigest() == '31d6cfe0d16ae931b73c59d7e0c089c0'
+    assert MD4(b'abc').hexdigest() == 'a448017aaf21d8525fc10ae87aa6729d'
+    h = MD4(b'1234567890' * 4)
+    c = h.copy()
+    c.update(b'1234567890' * 4)
+    assert h.hexdigest() == MD4(b'1234567890' * 4).hexdigest()
+    assert c.hexdigest() == 'e33b4ddc9c38f2199c3e7b164fcc0536'
+    assert md4(b'abc').digest() == MD4(b'abc').digest()
+
+
+def test_rcon_signer():
+    import hmac
+    from aio_dprcon.md4 import MD4
+    for password in ('12345', 'x' * 100):
+        signer = RconSigner(password)
+        assert signer.sign(b'1.000000 status 1') == hmac.new(password.encode(), b'1.000000 status 1', MD4).digest()
+    p = RconSigner('12345').challenge_packet(b'11111111111', 'status 1')
+    assert p == rcon_secure_challenge_packet('12345', b'11111111111', 'status 1')
+    assert p.startswith(QUAKE_PACKET_HEADER + b'srcon HMAC-MD4 CHALLENGE ')
+    assert p.endswith(b' 11111111111 status 1')
@@ -0,0 +1,62 @@
+import asyncio
+
+from aio_dprcon.ratelimit import TokenBucket, SendQueue, HIGH, BULK
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(10, 2, clock=clock)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == 0.1
+    clock.now = 0.05
+    assert abs(bucket.take() - 0.05) < 1e-9
+    clock.now = 0.1
+    assert bucket.take() == 0
+    # Groups larger than the bucket wait for a full bucket
+    clock.now = 1
+    assert bucket.take(5) == 0
+
+
+def test_send_queue_lanes_and_coalescing():
+    loop = asyncio.new_event_loop()
+    sent = []
+    queue = SendQueue(loop, sent.append, rate=100, burst=2)
+    queue.put(['cmd1', 'echo 1'])
+    assert sent == ['cmd1', 'echo 1']
+    queue.put(['cvarlist a', 'echo 2'], priority=BULK)
+    queue.put(['status 1'], priority=HIGH, coalesce=True)
+    assert not queue.put(['status 1'], priority=HIGH, coalesce=True)
+    assert len(queue) == 2 and queue.coalesced == 1
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert sent == ['cmd1', 'echo 1', 'status 1', 'cvarlist a', 'echo 2']
+    assert not queue.waiting
+    assert queue.put(['status 1'], priority=HIGH, coalesce=True)
+    queue.clear()
+    loop.close()
+
+
+def test_send_queue_keeps_groups_while_paused():
+    loop = asyncio.new_event_loop()
+    sent = []
+    queue = SendQueue(loop, sent.append, rate=100, burst=1)
+    queue.put(['cmd1'])
+    queue.put(['cmd2'])
+    # E.g. the client reconnects, while cmd2 waits for a token
+    queue.pause()
+    loop.run_until_complete(asyncio.sleep(0.05))
+    queue.put(['cmd3'])
+    assert sent == ['cmd1'] and len(queue) == 2
+    queue.resume()
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert sent == ['cmd1', 'cmd2', 'cmd3']
+    assert queue.timer is None
+    loop.close()
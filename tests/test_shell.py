@@ -0,0 +1,106 @@
+import asyncio
+from collections import namedtuple
+
+from aio_dprcon.client import RconClient
+from aio_dprcon.shell import RconShell
+from aio_dprcon.testing import FakeDarkplacesServer, FakePlayer
+
+Server = namedtuple('Server', 'name')
+
+
+def make_shell(rcon_client, mocker):
+    mocker.patch.object(RconShell, 'init_history')
+    shell = RconShell(Server('test'), rcon_client)
+    shell.prompt = '> '
+    return shell
+
+
+def test_output_streams_as_it_arrives(loop, rcon_client, mocker, capsys):
+    shell = make_shell(rcon_client, mocker)
+    addr = (rcon_client.remote_host, rcon_client.remote_port)
+
+    async def __run():
+        task = loop.create_task(shell.execute_line('cvarlist g_'))
+        await asyncio.sleep(0.01)
+        rcon_client.cmd_data_received(b'"g_a" is "1" ["1"]\n"g_b" is ', addr)
+        await asyncio.sleep(0.01)
+        assert capsys.readouterr().out == '"g_a" is "1" ["1"]\n'
+        rcon_client.cmd_data_received(b'"2" ["2"]\naio_dprcon_eoc_1\n', addr)
+        await task
+
+    loop.run_until_complete(__run())
+    assert capsys.readouterr().out == '"g_b" is "2" ["2"]\n'
+    assert shell.command_task is None
+
+
+def test_output_ignored_between_commands(loop, rcon_client, mocker, capsys):
+    make_shell(rcon_client, mocker)
+    rcon_client.cmd_data_received(b'status output\n', (rcon_client.remote_host, rcon_client.remote_port))
+    assert capsys.readouterr().out == ''
+
+
+def test_abort_cancels_command(loop, rcon_client, mocker, capsys):
+    shell = make_shell(rcon_client, mocker)
+
+    async def __run():
+        task = loop.create_task(shell.execute_line('sv_cmd slow'))
+        await asyncio.sleep(0.01)
+        shell.abort()
+        await task
+
+    loop.run_until_complete(__run())
+    assert 'aborted' in capsys.readouterr().out
+    assert not rcon_client.pending_responses
+
+
+def test_poll_answers_stay_out_of_command_output(mocker, capsys):
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(FakeDarkplacesServer().start(loop))
+    client = RconClient(loop, *server.address, password='secret', log_sink=False)
+    shell = make_shell(client, mocker)
+
+    async def __run():
+        assert await client.connect_once()
+        poll = loop.create_task(shell.poll())
+        # The poll has sent "status 1" and waits for the answer when the command is entered
+        await asyncio.sleep(0)
+        await shell.execute_line('cvarlist sv_')
+        await poll
+
+    loop.run_until_complete(__run())
+    output = capsys.readouterr().out
+    assert server.commands[-3:] == ['status 1', 'cvarlist sv_', 'echo aio_dprcon_eoc_1']
+    assert 'sv_gravity is "800"' in output
+    assert 'host:' not in output and 'players:' not in output
+    client.close()
+    server.close()
+    loop.close()
+
+
+def test_status_changes_printed_above_prompt(mocker, capsys):
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(FakeDarkplacesServer().start(loop))
+    client = RconClient(loop, *server.address, password='secret', log_sink=False)
+    shell = make_shell(client, mocker)
+    mocker.patch('readline.get_line_buffer', return_value='sv_cm')
+
+    async def __run():
+        changes_task = loop.create_task(shell.print_status_changes())
+        assert await client.connect_once()
+        server.players[1] = FakePlayer(1, 'alice')
+        # As if the user was typing "sv_cm" when the poll noticed the new player
+        shell.reading = True
+        await shell.poll()
+        await asyncio.sleep(0)
+        changes_task.cancel()
+        await asyncio.wait([changes_task])
+
+    loop.run_until_complete(__run())
+    output = capsys.readouterr().out
+    assert output.startswith('\r\x1b[Kalice ')
+    assert 'joined' in output
+    assert output.endswith('\n> sv_cm')
+    assert not client.event_streams
+    client.close()
+    server.close()
+    loop.close()
@@ -0,0 +1,64 @@
+import asyncio
+import gzip
+import io
+import os
+
+from aio_dprcon.sinks import StreamSink, RotatingFileSink
+
+
+def test_stream_sink_batches():
+    loop = asyncio.new_event_loop()
+    stream = io.BytesIO()
+    sink = StreamSink(loop, stream, flush_size=10, flush_interval=0.05)
+    sink.write(b'abc')
+    sink.write(b'def')
+    assert stream.getvalue() == b''
+    loop.run_until_complete(asyncio.sleep(0.1))
+    assert stream.getvalue() == b'abcdef'
+    sink.write(b'0123456789')
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert stream.getvalue() == b'abcdef0123456789'
+    loop.close()
+
+
+def test_stream_sink_drops_oldest():
+    loop = asyncio.new_event_loop()
+    stream = io.BytesIO()
+    sink = StreamSink(loop, stream, max_buffer=8, flush_size=100)
+    for chunk in (b'aaa', b'bbb', b'ccc', b'0123456789'):
+        sink.write(chunk)
+    assert sink.dropped == 13
+    sink.close()
+    assert stream.getvalue() == b'bbbccc'
+    loop.close()
+
+
+def test_rotating_file_sink(tmp_path):
+    loop = asyncio.new_event_loop()
+    path = str(tmp_path / 'log')
+    sink = RotatingFileSink(loop, path, max_bytes=10, backup_count=2, compress=True)
+    for chunk in (b'first line\n', b'second line\n', b'third line\n', b'tail'):
+        sink.write(chunk)
+        sink.close()
+    with gzip.open(path + '.1.gz') as f:
+        assert f.read() == b'third line\n'
+    with gzip.open(path + '.2.gz') as f:
+        assert f.read() == b'second line\n'
+    assert not os.path.exists(path + '.3.gz')
+    with open(path, 'rb') as f:
+        assert f.read() == b'tail'
+    loop.close()
+
+
+def test_close_keeps_order_with_pending_write():
+    loop = asyncio.new_event_loop()
+    stream = io.BytesIO()
+    sink = StreamSink(loop, stream, flush_size=3)
+    # Handed to the executor, but the loop doesn't run before close
+    sink.write(b'abc')
+    sink.write(b'def')
+    sink.close()
+    assert stream.getvalue() == b'abcdef'
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert stream.getvalue() == b'abcdef'
+    loop.close()
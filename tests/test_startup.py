@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+# Modules that only some commands need, they must not be imported just to parse the command line
+LAZY_MODULES = {'aio_dprcon.client', 'aio_dprcon.protocol', 'aio_dprcon.parser', 'aio_dprcon.shell',
+                'aio_dprcon.pool', 'aio_dprcon.completion', 'aio_dprcon.listener', 'aio_dprcon.probe', 'dpcolors',
+                'readline', 'hmac'}
+
+
+def imported_modules(module):
+    # A fresh interpreter, the modules imported by this test run must not count
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return set(line.rsplit('|', 1)[1].strip() for line in result.stderr.decode('utf8').splitlines()
+               if line.startswith('import time:') and 'self [us]' not in line)
+
+
+def test_cli_imports_lazily():
+    imported = imported_modules('aio_dprcon.cli')
+    assert 'aio_dprcon.cli' in imported
+    assert not LAZY_MODULES & imported
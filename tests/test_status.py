@@ -0,0 +1,62 @@
+from aio_dprcon.client import RconClient
+from aio_dprcon.status import PlayerJoined, PlayerLeft, MapChanged, FragsChanged
+
+STATUS = b'''host:     exe.pub | Relaxed Running | CTS/XDF
+map:      %(map)s
+players:  %(count)d active (16 max)
+
+^2IP                                             %%pl ping  time   frags  no   name
+%(rows)s'''
+
+
+def status_answer(map_name, players):
+    rows = b''.join(b'^7%-47s %2d %4d %s %4d  #%-3d ^7%s\n' % row for row in players)
+    return STATUS % {b'map': map_name, b'count': len(players), b'rows': rows}
+
+
+class StatusClient(RconClient):
+    def __init__(self, loop):
+        super().__init__(loop, '127.0.0.1', 26000, log_sink=False)
+        self.changes = []
+
+    def on_status_change(self, change):
+        self.changes.append(change)
+
+
+def test_status_changes(loop):
+    client = StatusClient(loop)
+    addr = ('127.0.0.1', 26000)
+    answer = status_answer(b'dance', [(b'1.2.3.4:26000', 0, 50, b' 0:01:02', 5, 1, b'alice'),
+                                      (b'botclient', 0, 0, b' 0:10:00', 0, 2, b'[BOT]Lion')])
+    # The player table arrives in two datagrams, nothing is committed before the last row
+    client.cmd_data_received(answer[:-20], addr)
+    assert not client.changes and not client.status.players
+    client.cmd_data_received(answer[-20:], addr)
+    assert client.status['map'] == 'dance'
+    assert client.status.players[1].name == 'alice'
+    assert client.status.players[1].time == 62
+    assert client.status.players[2].ip == 'botclient'
+    assert [c.kind for c in client.changes] == ['player_joined', 'player_joined']
+
+    client.changes.clear()
+    players = client.status.players
+    client.cmd_data_received(status_answer(b'dance', [(b'1.2.3.4:26000', 0, 40, b' 0:01:08', 7, 1, b'alice'),
+                                                      (b'5.6.7.8:26000', 0, 40, b' 0:00:03', 0, 2, b'bob')]), addr)
+    assert client.status.players is players
+    left, frags, joined = client.changes
+    assert left == PlayerLeft(client.status.players[2]._replace(ip='botclient', time=600, ping=0, name='[BOT]Lion'))
+    assert isinstance(joined, PlayerJoined) and joined.player.name == 'bob'
+    assert frags == FragsChanged(client.status.players[1], 5)
+
+    client.changes.clear()
+    client.cmd_data_received(status_answer(b'stormkeep', []), addr)
+    assert client.changes[0] == MapChanged('dance', 'stormkeep')
+    assert [c.kind for c in client.changes[1:]] == ['player_left', 'player_left']
+    assert not client.status.players
+    client.status.reset()
+    assert not client.status
+
+    # Reconnecting doesn't report the map as changed
+    client.changes.clear()
+    client.cmd_data_received(status_answer(b'stormkeep', []), addr)
+    assert client.changes == []
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from aio_dprcon.client import RconClient
+from aio_dprcon.probe import Prober
+from aio_dprcon.protocol import RCON_NOSECURE, RCON_SECURE_TIME, RCON_SECURE_CHALLENGE
+from aio_dprcon.testing import FakeDarkplacesServer, FakePlayer
+
+
+@pytest.mark.parametrize('secure', [RCON_NOSECURE, RCON_SECURE_TIME, RCON_SECURE_CHALLENGE])
+def test_fake_server_end_to_end(secure):
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(FakeDarkplacesServer(
+        password='12345', secure=secure, players=[FakePlayer(3, 'alice', ip='1.2.3.4:26000', frags=7)]).start(loop))
+    client = RconClient(loop, *server.address, password='12345', secure=secure, log_listener_ip='127.0.0.1',
+                        log_sink=False)
+
+    async def __session():
+        assert await client.connect_once(connect_log=True)
+        with client.events('join') as events:
+            server.emit_log([b':join:1:1:127.0.0.1:player'])
+            event = await asyncio.wait_for(events.__anext__(), 1)
+        return event, await client.execute('echo hello'), await client.execute('cvarlist sv_')
+
+    event, echo, cvarlist = loop.run_until_complete(__session())
+    assert client.status['map'] == 'dance'
+    assert client.status.players[3].frags == 7
+    assert event.nick == 'player'
+    assert echo == b'hello\n'
+    assert cvarlist.startswith(b'sv_adminnick is ""')
+    assert 'status 1' in server.commands
+    assert server.rejected == 0
+    assert server.cvars['log_dest_udp'] == '127.0.0.1:{}'.format(client.log_protocol.local_port)
+    server.close()
+    loop.close()
+
+
+def test_fake_server_rejects_wrong_password():
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(FakeDarkplacesServer(password='12345', secure=RCON_SECURE_TIME).start(loop))
+    client = RconClient(loop, *server.address, password='wrong', secure=RCON_SECURE_TIME, log_sink=False)
+    assert not loop.run_until_complete(client.connect_once())
+    assert server.rejected and not server.commands
+
+    prober = Prober(loop)
+    result = loop.run_until_complete(prober.getstatus(*server.address))
+    prober.close()
+    assert result.info['mapname'] == 'dance'
+    server.close()
+    loop.close()
+
+
+def test_fake_server_replays_sample_eventlog():
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(FakeDarkplacesServer(password='12345').start(loop))
+    client = RconClient(loop, *server.address, password='12345', log_listener_ip='127.0.0.1', log_sink=False)
+
+    async def __session():
+        assert await client.connect_once(connect_log=True)
+        with client.events() as events:
+            server.start_eventlog(rate=1000, loop=loop)
+            return await asyncio.wait_for(events.__anext__(), 1)
+
+    assert loop.run_until_complete(__session()).kind
+    server.close()
+    client.close()
+    loop.close()